@@ -1,19 +1,401 @@
+import bisect
+import copy
+import datetime
+import functools
+import hashlib
+import heapq
+import io
+import itertools
 import json
+import marshal
+import operator
 import os
+import random
+import re
+import shutil
+import struct
+import sys
 import uuid
 import time
-from natsort import natsorted
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокування файлів недоступне
+    fcntl = None
+
+
+def file_stamp(filename):
+    # Дешева перевірка змін файлу іншим процесом: без читання вмісту
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+@contextmanager
+def file_lock(filename, exclusive=False):
+    # Замок тримаємо на окремому .lock-файлі, бо сам файл даних замінюється через os.replace
+    if fcntl is None:
+        yield
+        return
+    with open(filename + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def target_mode(filename):
+    # mkstemp створює файл з правами 0600, і os.replace переніс би їх на основний файл. Беремо права
+    # наявного файлу, а для нового — звичайні 0666 з урахуванням umask, як при open()
+    try:
+        return os.stat(filename).st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(filename, write, binary=False):
+    # Пишемо у тимчасовий файл поруч і атомарно підміняємо ним основний
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix="-" + os.path.basename(filename), dir=directory)
+    try:
+        with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, target_mode(filename))
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def merge_records(disk_records, upserts, deletes, order=None):
+    # Зливає записи з диска з локальними змінами (додані/змінені та видалені за ID)
+    merged = []
+    seen = set()
+    for record in disk_records:
+        if record.id in deletes:
+            continue
+        merged.append(upserts.get(record.id, record))
+        seen.add(record.id)
+    for record_id, record in upserts.items():
+        if record_id not in seen and record_id not in deletes:
+            merged.append(record)
+    if order is not None:
+        position = {record_id: i for i, record_id in enumerate(order)}
+        merged.sort(key=lambda record: position.get(record.id, len(position)))
+    return merged
+
+
+class JsonCodec:
+    def __init__(self, name, indent=None):
+        self.name = name
+        self.indent = indent
+        self.separators = None if indent is not None else (",", ":")
+
+    def encode(self, records, f):
+        # Записи пишемо у потік по одному, без побудови спільного списку
+        dumps = json.JSONEncoder(ensure_ascii=False, indent=self.indent, separators=self.separators).encode
+        separator = b",\n" if self.indent is not None else b","
+        f.write(b"[")
+        for i, record in enumerate(records):
+            if i:
+                f.write(separator)
+            f.write(dumps(record).encode("utf-8"))
+        f.write(b"]")
+
+    def decode(self, f):
+        data = f.read()
+        return json.loads(data.decode("utf-8")) if data.strip() else []
+
+
+class JsonlCodec:
+    # Перший рядок — заголовок, щоб файл не сплутати з JSON-масивом
+    name = "jsonl"
+    HEADER = b'{"format":"jsonl"}\n'
+
+    def encode(self, records, f):
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        f.write(self.HEADER)
+        for record in records:
+            f.write((dumps(record) + "\n").encode("utf-8"))
+
+    def decode(self, f):
+        loads = json.loads
+        records = [loads(line) for line in f.read().decode("utf-8").splitlines() if line.strip()]
+        if records and isinstance(records[0], dict) and "format" in records[0]:
+            del records[0]
+        return records
+
+
+class BinaryCodec:
+    # Формат: сигнатура, далі записи у вигляді <довжина uint32><marshal-дані>
+    name = "binary"
+    MAGIC = b"VLB1"
+
+    def encode(self, records, f):
+        pack = struct.Struct("<I").pack
+        dumps = marshal.dumps
+        write = f.write
+        write(self.MAGIC)
+        for record in records:
+            data = dumps(record)
+            write(pack(len(data)))
+            write(data)
+
+    def decode(self, f):
+        data = f.read()
+        if data[:4] != self.MAGIC:
+            raise ValueError("Файл не є бінарним каталогом")
+        unpack_from = struct.Struct("<I").unpack_from
+        loads = marshal.loads
+        records = []
+        position = 4
+        end = len(data)
+        while position < end:
+            (length,) = unpack_from(data, position)
+            position += 4
+            records.append(loads(data[position:position + length]))
+            position += length
+        return records
+
+
+CODECS = {
+    "json": JsonCodec("json", indent=4),
+    "json-compact": JsonCodec("json-compact"),
+    "jsonl": JsonlCodec(),
+    "binary": BinaryCodec(),
+}
+
+
+def detect_codec(head):
+    # Формат визначаємо за першими байтами файлу, а не за налаштуваннями
+    if head.startswith(BinaryCodec.MAGIC):
+        return CODECS["binary"]
+    if head.lstrip().startswith(b"{"):
+        return CODECS["jsonl"]
+    return CODECS["json"]
+
+
+COMPRESSION_EXTENSIONS = {".gz": "gzip", ".xz": "lzma", ".lzma": "lzma", ".bz2": "bz2"}
+COMPRESSION_MAGIC = ((b"\x1f\x8b", "gzip"), (b"\xfd7zXZ\x00", "lzma"), (b"BZh", "bz2"))
+
+
+def compression_by_extension(filename):
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+
+
+def compression_by_magic(head):
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_compressed(f, compression, mode):
+    # Потокові (де)компресори поверх уже відкритого файлу; сам файл вони не закривають.
+    # Модулі стиснення імпортуємо лише тоді, коли вони справді потрібні
+    if compression == "gzip":
+        import gzip
+        return gzip.GzipFile(fileobj=f, mode=mode, compresslevel=6)
+    if compression == "lzma":
+        import lzma
+        return lzma.LZMAFile(f, mode)
+    if compression == "bz2":
+        import bz2
+        return bz2.BZ2File(f, mode)
+    return nullcontext(f)
+
+
+def read_records(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, "rb") as raw:
+        compression = compression_by_magic(raw.peek(6)[:6])
+        with open_compressed(raw, compression, "rb") as f:
+            return detect_codec(f.peek(64)[:64]).decode(f)
+
+
+def write_records(filename, records, codec="json"):
+    # Стиснення обираємо за розширенням: catalog.json.gz, catalog.json.xz, catalog.json.bz2
+    def write(raw):
+        with open_compressed(raw, compression_by_extension(filename), "wb") as f:
+            CODECS[codec].encode(records, f)
+
+    atomic_write(filename, write, binary=True)
+
+
+# Знімок розібраних записів поруч із файлом: заголовок із ключем джерела (mtime, розмір, хеш),
+# далі весь список записів одним marshal-блоком, який читається за один виклик
+SNAPSHOT_MAGIC = b"VLS1"
+SNAPSHOT_HEADER = struct.Struct("<4sqQ16s")
+
+
+def snapshot_filename(filename):
+    return filename + ".snapshot"
+
+
+def file_digest(filename):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as f:
+        for chunk in iter(functools.partial(f.read, 1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def source_key(filename):
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size, file_digest(filename)
+
+
+def read_snapshot(filename):
+    try:
+        with open(snapshot_filename(filename), "rb") as f:
+            data = f.read()
+        magic, mtime_ns, size, digest = SNAPSHOT_HEADER.unpack_from(data)
+        stat = os.stat(filename)
+        # Хеш рахуємо лише тоді, коли дешева перевірка mtime і розміру вже пройшла
+        if (magic != SNAPSHOT_MAGIC or (mtime_ns, size) != (stat.st_mtime_ns, stat.st_size)
+                or digest != file_digest(filename)):
+            return None
+        return marshal.loads(memoryview(data)[SNAPSHOT_HEADER.size:])
+    except (OSError, struct.error, EOFError, ValueError, TypeError):
+        return None
+
+
+def write_snapshot(filename, records, key=None):
+    # Знімок — лише прискорення: якщо записати його не вдалося, просто читаємо джерело наступного разу
+    try:
+        mtime_ns, size, digest = key or source_key(filename)
+        payload = marshal.dumps(records)
+
+        def write(f):
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, mtime_ns, size, digest))
+            f.write(payload)
+
+        atomic_write(snapshot_filename(filename), write, binary=True)
+    except (OSError, ValueError):
+        pass
+
+
+def read_records_cached(filename):
+    if not os.path.exists(filename):
+        return []
+    records = read_snapshot(filename)
+    if records is None:
+        # Ключ беремо до читання: якщо файл зміниться посередині, знімок просто не збіжеться
+        key = source_key(filename)
+        records = read_records(filename)
+        write_snapshot(filename, records, key)
+    return records
+
+
+def read_records_locked(filename):
+    # Виконується і в процесах-працівниках: повертає штамп файлу та вже розібрані записи (кортежі)
+    with file_lock(filename):
+        return file_stamp(filename), read_records_cached(filename)
+
+
+class DescriptionStore:
+    # Описи уроків лежать в окремому файлі-блобі; у каталозі зберігається лише (зсув, довжина).
+    # Блоб лише дописується, тому зсуви інших процесів лишаються дійсними до ущільнення.
+    def __init__(self, filename, cache_size=256):
+        self.filename = filename
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._warned = False
+        # Тримаємо відкритий дескриптор: після ущільнення іншим процесом старі зсуви читаються зі старого файлу
+        self._file = open(filename, "rb") if os.path.exists(filename) else None
+
+    def _warn(self, problem):
+        # Пошкоджений блоб не повинен зупиняти програму: описи стають порожніми, попередження — одне
+        if not self._warned:
+            print(f"Увага: {problem} ({self.filename}); описи уроків можуть бути порожніми.")
+            self._warned = True
+
+    def check(self, end):
+        # end — найбільший зсув + довжина серед уроків каталогу
+        if end and self.size() < end:
+            self._warn("файл описів відсутній" if not os.path.exists(self.filename) else "файл описів обрізаний")
+
+    def read(self, offset, length):
+        key = (offset, length)
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            return text
+        text = self._read_from_file(offset, length)
+        self._cache[key] = text
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return text
+
+    def _read_from_file(self, offset, length):
+        try:
+            if self._file is None:
+                self._file = open(self.filename, "rb")
+            self._file.seek(offset)
+            data = self._file.read(length)
+        except OSError:
+            self._warn("файл описів недоступний")
+            return ""
+        if len(data) < length:
+            self._warn("файл описів обрізаний")
+            return ""
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            self._warn("файл описів пошкоджений")
+            return ""
+
+    def append_many(self, texts):
+        refs = []
+        with open(self.filename, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            for text in texts:
+                data = text.encode("utf-8")
+                f.write(data)
+                refs.append((self, offset, len(data)))
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return refs
+
+    def size(self):
+        return os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
 
 
 class VideoLesson:
-    def __init__(self, title, description, author, duration, category, lesson_id=None):
+    def __init__(self, title, description, author, duration, category, lesson_id=None, description_ref=None):
         self.id = lesson_id if lesson_id is not None else str(uuid.uuid4())
         self.title = title
         self.description = description
+        self.description_ref = description_ref  # (DescriptionStore, зсув, довжина) для лінивого опису
         self.author = author
         self.duration = duration  # тривалість у хвилинах
         self.category = category
 
+    @property
+    def description(self):
+        if self._description is None and self.description_ref is not None:
+            store, offset, length = self.description_ref
+            return store.read(offset, length)
+        return self._description
+
+    @description.setter
+    def description(self, value):
+        self._description = value
+        self.description_ref = None
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -25,26 +407,822 @@ class VideoLesson:
         }
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, description_store=None):
+        ref = data.get('description_ref')
         return cls(
             data['title'],
-            data['description'],
+            data.get('description'),
             data['author'],
             data['duration'],
             data['category'],
-            lesson_id=data.get('id')
+            lesson_id=data.get('id'),
+            description_ref=(description_store, ref[0], ref[1]) if ref is not None else None
         )
 
+    def collation_key(self, field):
+        # Кеш ключа зберігає значення, для якого його обчислено: після редагування поля ключ перераховується
+        value = getattr(self, field) or ""
+        cached = self.__dict__.get("_collation_" + field)
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        key = collation_key(str(value))
+        self.__dict__["_collation_" + field] = (value, key)
+        return key
+
     def __str__(self):
         return (f"🆔 ID: {self.id} | 📚 Назва: {self.title} (📂 Категорія: {self.category}) "
                 f"✍️ Автор: {self.author}, ⏱ Тривалість: {self.duration} хв.\n 📝 Опис: {self.description}")
 
 
+class Aggregates:
+    # Підсумки, що оновлюються при кожному додаванні/видаленні/редагуванні, а не перераховуються
+    def __init__(self, lessons=()):
+        self.count = 0
+        self.total_duration = 0
+        self.by_category = {}
+        self.by_author = {}
+        # Початкові підсумки рахуємо одним проходом без _apply на кожен урок
+        by_category, by_author = self.by_category, self.by_author
+        for lesson in lessons:
+            self.count += 1
+            self.total_duration += lesson.duration or 0
+            by_category[lesson.category] = by_category.get(lesson.category, 0) + 1
+            by_author[lesson.author] = by_author.get(lesson.author, 0) + 1
+
+    def _apply(self, lesson, sign):
+        self.count += sign
+        self.total_duration += sign * (lesson.duration or 0)
+        for counts, key in ((self.by_category, lesson.category), (self.by_author, lesson.author)):
+            value = counts.get(key, 0) + sign
+            if value:
+                counts[key] = value
+            else:
+                del counts[key]
+
+    def add(self, lesson):
+        self._apply(lesson, 1)
+
+    def remove(self, lesson):
+        self._apply(lesson, -1)
+
+    def replace(self, old, new):
+        self._apply(old, -1)
+        self._apply(new, 1)
+
+    @property
+    def mean_duration(self):
+        return self.total_duration / self.count if self.count else 0
+
+    def display(self):
+        print(f"Уроків: {self.count}, загальна тривалість: {self.total_duration} хв., "
+              f"середня: {self.mean_duration:.1f} хв.")
+        if self.by_category:
+            print("За категоріями: " + ", ".join(f"{key}: {value}" for key, value in self.by_category.items()))
+        if self.by_author:
+            print("За авторами: " + ", ".join(f"{key}: {value}" for key, value in self.by_author.items()))
+
+
+class LessonIndex:
+    # Індекси каталогу: за ID, відсортований список (тривалість, ID) для діапазонів через bisect,
+    # а також категорія/автор (без урахування регістру) -> {ID: урок}.
+    # positions — ID -> порядковий номер у каталозі: номери лише зростають (видалення не зсуває решту),
+    # тож за ними результати індексів повертаються в порядок каталогу
+    def __init__(self, lessons=()):
+        self.by_id = {}
+        self.durations = []
+        self.by_category = {}
+        self.by_author = {}
+        self.positions = {}
+        for position, lesson in enumerate(lessons):
+            self.positions[lesson.id] = position
+            self.by_id[lesson.id] = lesson
+            self.by_category.setdefault(lesson.category.lower(), {})[lesson.id] = lesson
+            self.by_author.setdefault(lesson.author.lower(), {})[lesson.id] = lesson
+        # При побудові сортуємо один раз, а не вставляємо кожен урок через insort
+        self.durations = sorted((lesson.duration or 0, lesson.id) for lesson in self.by_id.values())
+        self._next_position = len(self.positions)
+
+    def renumber(self, lessons):
+        # Після зміни порядку каталогу (сортування)
+        self.positions = {lesson.id: position for position, lesson in enumerate(lessons)}
+        self._next_position = len(self.positions)
+
+    def in_catalog_order(self, lessons):
+        positions = self.positions
+        return sorted(lessons, key=lambda lesson: positions[lesson.id])
+
+    BATCH_THRESHOLD = 32  # з якого розміру пакета список тривалостей перебудовується одним проходом
+
+    def _link(self, lesson):
+        self.by_id[lesson.id] = lesson
+        self.by_category.setdefault(lesson.category.lower(), {})[lesson.id] = lesson
+        self.by_author.setdefault(lesson.author.lower(), {})[lesson.id] = lesson
+
+    def _unlink(self, lesson):
+        del self.by_id[lesson.id]
+        for buckets, value in ((self.by_category, lesson.category), (self.by_author, lesson.author)):
+            bucket = buckets.get(value.lower())
+            if bucket is not None:
+                bucket.pop(lesson.id, None)
+                if not bucket:
+                    del buckets[value.lower()]
+
+    def _append_positions(self, lessons):
+        for lesson in lessons:
+            self.positions[lesson.id] = self._next_position
+            self._next_position += 1
+
+    def add(self, lesson):
+        self._link(lesson)
+        self._append_positions((lesson,))
+        bisect.insort(self.durations, (lesson.duration or 0, lesson.id))
+
+    def remove(self, lesson):
+        self._unlink(lesson)
+        self.positions.pop(lesson.id, None)
+        key = (lesson.duration or 0, lesson.id)
+        position = bisect.bisect_left(self.durations, key)
+        if position < len(self.durations) and self.durations[position] == key:
+            del self.durations[position]
+
+    def replace(self, previous, lesson):
+        # Редагування не змінює місця уроку в каталозі
+        position = self.positions[previous.id]
+        self.remove(previous)
+        self.add(lesson)
+        self.positions[lesson.id] = position
+
+    # Пакети: кожна вставка/видалення в середині списку тривалостей зсуває його хвіст, тож для великого
+    # пакета список фільтрується чи досортовується один раз (timsort на майже впорядкованих даних — O(n))
+    def add_many(self, lessons):
+        if len(lessons) < self.BATCH_THRESHOLD:
+            for lesson in lessons:
+                self.add(lesson)
+            return
+        for lesson in lessons:
+            self._link(lesson)
+        self._append_positions(lessons)
+        self.durations.extend((lesson.duration or 0, lesson.id) for lesson in lessons)
+        self.durations.sort()
+
+    def remove_many(self, lessons):
+        if len(lessons) < self.BATCH_THRESHOLD:
+            for lesson in lessons:
+                self.remove(lesson)
+            return
+        for lesson in lessons:
+            self._unlink(lesson)
+            self.positions.pop(lesson.id, None)
+        removed = {(lesson.duration or 0, lesson.id) for lesson in lessons}
+        self.durations = [key for key in self.durations if key not in removed]
+
+    def replace_many(self, previous, lessons):
+        positions = [self.positions[lesson.id] for lesson in previous]
+        self.remove_many(previous)
+        self.add_many(lessons)
+        self.positions.update(zip((lesson.id for lesson in lessons), positions))
+
+    def duration_bounds(self, min_duration=None, max_duration=None):
+        low = 0 if min_duration is None else bisect.bisect_left(self.durations, (min_duration, ""))
+        high = (len(self.durations) if max_duration is None
+                else bisect.bisect_right(self.durations, (max_duration, "\U0010ffff")))
+        return low, max(low, high)
+
+    def duration_range(self, min_duration=None, max_duration=None):
+        low, high = self.duration_bounds(min_duration, max_duration)
+        by_id = self.by_id
+        return [by_id[lesson_id] for _, lesson_id in self.durations[low:high]]
+
+
+QUERY_FIELDS = ("id", "title", "description", "author", "duration", "category")
+QUERY_TOKEN = re.compile(r'\s*(?:(?P<number>\d+)|"(?P<string>[^"]*)"|(?P<op><=|>=|!=|=|<|>|~|\(|\))|(?P<word>\w+))',
+                         re.UNICODE)
+COMPARISONS = {
+    "=": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "~": lambda value, pattern: pattern in value,
+}
+INVERSE_COMPARISONS = {"=": "!=", "!=": "=", "<": ">=", "<=": ">", ">": "<=", ">=": "<"}
+
+
+def tokenize_query(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = QUERY_TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Незрозумілий фрагмент запиту: {text[position:position + 20]!r}")
+        position = match.end()
+        if match.group("number") is not None:
+            tokens.append(("value", int(match.group("number"))))
+        elif match.group("string") is not None:
+            tokens.append(("value", match.group("string")))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op")))
+        else:
+            word = match.group("word")
+            lowered = word.lower()
+            if lowered in ("and", "or", "not", "order", "by", "asc", "desc", "limit"):
+                tokens.append(("keyword", lowered))
+            else:
+                tokens.append(("word", word))
+    return tokens
+
+
+class Query:
+    # Розібраний запит. Умова — дерево кортежів:
+    # ("cmp", поле, оператор, значення), ("and", [...]), ("or", [...]), ("not", вузол)
+    # Приклад: category = "Програмування" and duration >= 30 and not author = "Олег" order by title limit 10
+    def __init__(self, where=None, order_by=None, descending=False, limit=None):
+        self.where = where
+        self.order_by = order_by
+        self.descending = descending
+        self.limit = limit
+
+    @classmethod
+    def parse(cls, text):
+        parser = _QueryParser(tokenize_query(text))
+        where = None
+        if parser.peek() not in (("keyword", "order"), ("keyword", "limit"), None):
+            where = parser.parse_or()
+        order_by, descending, limit = None, False, None
+        if parser.accept("keyword", "order"):
+            parser.expect("keyword", "by")
+            order_by = parser.field()
+            if parser.accept("keyword", "desc"):
+                descending = True
+            else:
+                parser.accept("keyword", "asc")
+        if parser.accept("keyword", "limit"):
+            limit = parser.value()
+            if not isinstance(limit, int):
+                raise ValueError("LIMIT має бути числом")
+        if parser.peek() is not None:
+            raise ValueError(f"Зайвий фрагмент запиту: {parser.peek()[1]!r}")
+        return cls(normalize_condition(where), order_by, descending, limit)
+
+    @property
+    def key(self):
+        # Нормалізований вигляд запиту: однакові за змістом запити мають однаковий ключ
+        return describe_condition(self.where), self.order_by, self.descending, self.limit
+
+
+class _QueryParser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def accept(self, kind, text=None):
+        token = self.peek()
+        if token is not None and token[0] == kind and (text is None or token[1] == text):
+            self.position += 1
+            return token
+        return None
+
+    def expect(self, kind, text=None):
+        token = self.accept(kind, text)
+        if token is None:
+            raise ValueError(f"Очікувалось {text or kind}, отримано {self.peek()[1] if self.peek() else 'кінець'}")
+        return token
+
+    def field(self):
+        name = self.expect("word")[1].lower()
+        if name not in QUERY_FIELDS:
+            raise ValueError(f"Невідоме поле: {name}")
+        return name
+
+    def value(self):
+        return self.expect("value")[1]
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.accept("keyword", "or"):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.accept("keyword", "and"):
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.accept("keyword", "not"):
+            return "not", self.parse_not()
+        if self.accept("op", "("):
+            node = self.parse_or()
+            self.expect("op", ")")
+            return node
+        field = self.field()
+        op = self.expect("op")[1]
+        if op not in COMPARISONS:
+            raise ValueError(f"Невідомий оператор: {op}")
+        value = self.value()
+        if field == "duration":
+            if not isinstance(value, int):
+                raise ValueError("Тривалість порівнюється з числом")
+            if op == "~":
+                raise ValueError("Оператор ~ застосовується лише до тексту")
+        else:
+            # Текстові поля порівнюються без урахування регістру, як і у filter_lessons
+            value = str(value).lower()
+        return "cmp", field, op, value
+
+
+def normalize_condition(node):
+    # Розгортаємо вкладені AND/OR і впорядковуємо доданки, щоб порядок умов не впливав на ключ
+    if node is None or node[0] == "cmp":
+        return node
+    if node[0] == "not":
+        inner = normalize_condition(node[1])
+        if inner[0] == "cmp" and inner[2] in INVERSE_COMPARISONS:
+            # NOT над простим порівнянням замінюємо оберненим оператором, щоб воно могло йти через індекс
+            return "cmp", inner[1], INVERSE_COMPARISONS[inner[2]], inner[3]
+        return "not", inner
+    children = []
+    for child in map(normalize_condition, node[1]):
+        children.extend(child[1] if child[0] == node[0] else [child])
+    children.sort(key=describe_condition)
+    return node[0], children
+
+
+def describe_condition(node):
+    if node is None:
+        return ""
+    if node[0] == "cmp":
+        return f"{node[1]} {node[2]} {node[3]!r}"
+    if node[0] == "not":
+        return f"not ({describe_condition(node[1])})"
+    return "(" + f" {node[0]} ".join(describe_condition(child) for child in node[1]) + ")"
+
+
+def compile_condition(node):
+    if node is None:
+        return lambda lesson: True
+    if node[0] == "cmp":
+        _, field, op, value = node
+        compare = COMPARISONS[op]
+        if field == "duration":
+            return lambda lesson: compare(lesson.duration or 0, value)
+        getter = operator.attrgetter(field)
+        return lambda lesson: compare((getter(lesson) or "").lower(), value)
+    if node[0] == "not":
+        inner = compile_condition(node[1])
+        return lambda lesson: not inner(lesson)
+    parts = [compile_condition(child) for child in node[1]]
+    if node[0] == "and":
+        return lambda lesson: all(part(lesson) for part in parts)
+    return lambda lesson: any(part(lesson) for part in parts)
+
+
+class QueryPlanner:
+    # Для кон'юнкції обираємо найвибірковіший доступний індекс (ID, категорія, автор, діапазон тривалості),
+    # решту умов перевіряємо у порядку зростання оціненої вибірковості. OR розбивається на об'єднання,
+    # якщо кожна гілка має власний індекс, інакше — повний перегляд.
+    TEXT_SELECTIVITY = 0.1
+
+    def __init__(self, index, total, scanner=None):
+        self.index = index
+        self.total = max(total, 1)
+        self.scanner = scanner
+
+    def selectivity(self, node):
+        kind = node[0]
+        if kind == "not":
+            return 1 - self.selectivity(node[1])
+        if kind == "and":
+            result = 1.0
+            for child in node[1]:
+                result *= self.selectivity(child)
+            return result
+        if kind == "or":
+            return min(1.0, sum(self.selectivity(child) for child in node[1]))
+        _, field, op, value = node
+        if field == "duration":
+            low, high = self.index.duration_bounds(*duration_limits([node]))
+            return (high - low) / self.total
+        if op in ("=", "!="):
+            if field == "id":
+                matched = 1 if value in self.index.by_id else 0
+            elif field in ("category", "author"):
+                buckets = self.index.by_category if field == "category" else self.index.by_author
+                matched = len(buckets.get(value, ()))
+            else:
+                matched = self.total * self.TEXT_SELECTIVITY
+            fraction = matched / self.total
+            return fraction if op == "=" else 1 - fraction
+        return self.TEXT_SELECTIVITY
+
+    def access_path(self, conjuncts):
+        # (опис, вартість, функція вибірки, покриті умови)
+        best = ("повний перегляд", self.total, None, [])
+        if self.scanner is not None and self.scanner.parallel(self.total):
+            best = (f"паралельний повний перегляд, процесів: {self.scanner.workers}", self.total, None, [])
+        by_id = self.index.by_id
+        for node in conjuncts:
+            if node[0] != "cmp" or node[2] != "=":
+                continue
+            _, field, _, value = node
+            if field == "id":
+                lesson = by_id.get(value)
+                rows = [lesson] if lesson is not None else []
+                candidate = (f"індекс ID {value!r}", len(rows), lambda rows=rows: rows, [node])
+            elif field in ("category", "author"):
+                buckets = self.index.by_category if field == "category" else self.index.by_author
+                bucket = buckets.get(value, {})
+                name = "категорії" if field == "category" else "автора"
+                candidate = (f"індекс {name} {value!r}", len(bucket), lambda bucket=bucket: list(bucket.values()),
+                             [node])
+            else:
+                continue
+            if candidate[1] < best[1]:
+                best = candidate
+        ranged = [node for node in conjuncts if node[0] == "cmp" and node[1] == "duration" and node[2] != "!="]
+        if ranged:
+            low, high = duration_limits(ranged)
+            start, end = self.index.duration_bounds(low, high)
+            if end - start < best[1]:
+                best = (f"відсортований індекс тривалості [{low if low is not None else '-∞'}; "
+                        f"{high if high is not None else '+∞'}]", end - start,
+                        lambda: self.index.duration_range(low, high), ranged)
+        return best
+
+    def plan(self, query):
+        where = query.where
+        if where is not None and where[0] == "or":
+            branches = [self.plan_conjunction(self._conjuncts(child)) for child in where[1]]
+            cost = sum(branch.cost for branch in branches)
+            if all(branch.fetch is not None for branch in branches) and cost < self.total:
+                return QueryPlan(query, branches=branches, cost=cost)
+        return self.plan_conjunction(self._conjuncts(where), query)
+
+    @staticmethod
+    def _conjuncts(node):
+        if node is None:
+            return []
+        return list(node[1]) if node[0] == "and" else [node]
+
+    def plan_conjunction(self, conjuncts, query=None):
+        access, cost, fetch, covered = self.access_path(conjuncts)
+        residual = [node for node in conjuncts if not any(node is done for done in covered)]
+        residual.sort(key=self.selectivity)
+        return QueryPlan(query, access=access, fetch=fetch, cost=cost,
+                         residual=[(node, self.selectivity(node)) for node in residual])
+
+
+def duration_limits(nodes):
+    # Зводимо умови на тривалість до одного включного діапазону [low; high]
+    low, high = None, None
+    for _, _, op, value in nodes:
+        if op in (">", ">=", "="):
+            bound = value + 1 if op == ">" else value
+            low = bound if low is None else max(low, bound)
+        if op in ("<", "<=", "="):
+            bound = value - 1 if op == "<" else value
+            high = bound if high is None else min(high, bound)
+    return low, high
+
+
+class QueryPlan:
+    def __init__(self, query, access=None, fetch=None, cost=0, residual=(), branches=None):
+        self.query = query
+        self.access = access
+        self.fetch = fetch
+        self.cost = cost
+        self.residual = list(residual)
+        self.branches = branches
+
+    def candidates(self, catalog):
+        if self.branches is not None:
+            seen = set()
+            for branch in self.branches:
+                for lesson in branch.candidates(catalog):
+                    if lesson.id not in seen:
+                        seen.add(lesson.id)
+                        yield lesson
+            return
+        if self.fetch is None and self.residual and catalog.scanner.parallel(len(catalog.lessons)):
+            nodes = [node for node, _ in self.residual]
+            yield from catalog.scanner.scan(catalog, nodes[0] if len(nodes) == 1 else ("and", nodes))
+            return
+        rows = self.fetch() if self.fetch is not None else catalog.lessons
+        checks = [compile_condition(node) for node, _ in self.residual]
+        for lesson in rows:
+            if all(check(lesson) for check in checks):
+                yield lesson
+
+    def execute(self, catalog):
+        query = self.query
+        rows = self.candidates(catalog)
+        if query.order_by is None:
+            if self.fetch is not None or self.branches is not None:
+                # Індекси видають уроки у власному порядку; без ORDER BY повертаємо порядок каталогу
+                rows = catalog.index.in_catalog_order(rows)
+            return list(itertools.islice(rows, query.limit)) if query.limit is not None else list(rows)
+        key = order_key(query.order_by)
+        if query.limit is not None:
+            pick = heapq.nlargest if query.descending else heapq.nsmallest
+            return pick(query.limit, rows, key=key)
+        return sorted(rows, key=key, reverse=query.descending)
+
+    def explain(self, indent=""):
+        lines = []
+        if self.query is not None:
+            lines.append(f"{indent}Запит: {describe_condition(self.query.where) or '(усі уроки)'}")
+        if self.branches is not None:
+            lines.append(f"{indent}Об'єднання {len(self.branches)} гілок OR (оцінка ≈{self.cost} рядків):")
+            for branch in self.branches:
+                lines.extend(branch.explain(indent + "  "))
+        else:
+            lines.append(f"{indent}Доступ: {self.access} (≈{self.cost} рядків)")
+            if self.residual:
+                lines.append(f"{indent}Фільтри за вибірковістю: " + ", ".join(
+                    f"{describe_condition(node)} [{selectivity:.2f}]" for node, selectivity in self.residual))
+        if self.query is not None:
+            if self.query.order_by is not None:
+                direction = "DESC" if self.query.descending else "ASC"
+                method = "частковий відбір heapq" if self.query.limit is not None else "повне сортування"
+                lines.append(f"{indent}Сортування: {self.query.order_by} {direction} ({method})")
+            if self.query.limit is not None:
+                lines.append(f"{indent}Ліміт: {self.query.limit}")
+        return lines
+
+
+UKRAINIAN_ALPHABET = "абвгґдеєжзиіїйклмнопрстуфхцчшщьюя"
+LATIN_ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+NUMBER_RUN = re.compile(r"\d+")
+
+
+def build_collation_table():
+    # Кожна літера отримує "вагу" — символ, чий код задає місце в алфавіті: латиниця, за нею українська
+    # абетка, далі решта кирилиці. Пробіли й розділові знаки лишаються собою і йдуть перед літерами,
+    # апостроф ігнорується (як в українських словниках), латинські літери з діакритикою важать як базові.
+    import unicodedata
+    table = {ord(letter): chr(0x1000 + i) for i, letter in enumerate(LATIN_ALPHABET)}
+    table.update((ord(letter), chr(0x1100 + i)) for i, letter in enumerate(UKRAINIAN_ALPHABET))
+    for code in range(0x0400, 0x0530):
+        if chr(code).isalpha() and chr(code).islower() and code not in table:
+            table[code] = chr(0x1200 + code)
+    for code in range(0x00C0, 0x0250):
+        base = unicodedata.normalize("NFD", chr(code))[0]
+        if chr(code).islower() and base in LATIN_ALPHABET:
+            table[code] = table[ord(base)]
+    for apostrophe in "'’ʼ`":
+        table[ord(apostrophe)] = None
+    return table
+
+
+COLLATION_TABLE = build_collation_table()
+
+
+def _number_weight(match):
+    # Число важить як маркер довжини + цифри: довше число більше, рівні за довжиною порівнюються по цифрах
+    digits = str(int(match.group()))
+    return chr(0x0E00 + len(digits)) + digits
+
+
+def collation_key(text):
+    # Ключ — один рядок ваг, тож сортування зводиться до швидкого порівняння рядків. Маркери чисел
+    # лежать нижче за ваги літер (числа перед словами), а оригінальний рядок після "\0" впорядковує
+    # варіанти, що різняться лише регістром чи нулями на початку числа
+    primary = NUMBER_RUN.sub(_number_weight, text.strip().lower().translate(COLLATION_TABLE))
+    return primary + "\0" + text
+
+
+def order_key(field):
+    if field == "duration":
+        return lambda lesson: lesson.duration or 0
+    # Ключ обчислюється один раз і зберігається в уроці, тож сортування — це порівняння готових рядків
+    return operator.methodcaller("collation_key", field)
+
+
+def condition_fields(node):
+    if node is None:
+        return set()
+    if node[0] == "cmp":
+        return {node[1]}
+    if node[0] == "not":
+        return condition_fields(node[1])
+    return set().union(*map(condition_fields, node[1]))
+
+
+class _ScanRow:
+    # Рядок колонкового перегляду: умова із compile_condition читає з нього ті самі атрибути, що й з уроку
+    __slots__ = QUERY_FIELDS
+
+
+def attach_shared_block(name):
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name)
+
+
+def scan_shared_columns(columns, node, start, end):
+    # Виконується в процесі-працівнику: перевіряє рядки [start; end) за колонками у спільній пам'яті.
+    # Текстова колонка — (зсуви int64, байти UTF-8), тривалість — масив int64
+    blocks = []
+    views = []
+    getters = []
+    try:
+        for field, names in columns.items():
+            blocks.extend(attach_shared_block(name) for name in names)
+            if field == "duration":
+                values = blocks[-1].buf.cast("q")
+                views.append(values)
+                getters.append((field, values.__getitem__))
+            else:
+                offsets = blocks[-2].buf.cast("q")
+                data = blocks[-1].buf
+                views.append(offsets)
+                getters.append((field, lambda i, offsets=offsets, data=data: str(data[offsets[i]:offsets[i + 1]],
+                                                                                 "utf-8")))
+        check = compile_condition(node)
+        row = _ScanRow()
+        matches = []
+        for i in range(start, end):
+            for field, get in getters:
+                setattr(row, field, get(i))
+            if check(row):
+                matches.append(i)
+        return matches
+    finally:
+        getters.clear()
+        for view in views:
+            view.release()
+        for block in blocks:
+            block.close()
+
+
+class ParallelScanner:
+    # Повний перегляд для умов, яких не покриває жоден індекс (підрядок в описі тощо): потрібні колонки
+    # кладуться в multiprocessing.shared_memory, діапазон рядків ділиться між процесами, а номери
+    # знайдених рядків зливаються по порядку. Малі каталоги та одноядерні машини переглядаються послідовно.
+    def __init__(self, workers=None, min_rows=50_000):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self.columns = {}  # поле -> блоки спільної пам'яті
+        self._version = None
+        self._pool = None
+
+    def parallel(self, rows):
+        return self.workers > 1 and rows >= self.min_rows
+
+    def _share(self, data):
+        from multiprocessing import shared_memory
+        block = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        block.buf[:len(data)] = data
+        return block
+
+    def _column(self, lessons, field):
+        import array
+        if field == "duration":
+            return (self._share(array.array("q", [lesson.duration or 0 for lesson in lessons]).tobytes()),)
+        chunks = [(getattr(lesson, field) or "").encode("utf-8") for lesson in lessons]
+        offsets = array.array("q", itertools.accumulate(map(len, chunks), initial=0))
+        return self._share(offsets.tobytes()), self._share(b"".join(chunks))
+
+    def _release_columns(self):
+        for blocks in self.columns.values():
+            for block in blocks:
+                block.close()
+                block.unlink()
+        self.columns = {}
+
+    def _executor(self):
+        if self._pool is None:
+            import atexit
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # fork: працівники спільно з батьківським процесом користуються його resource_tracker
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            atexit.register(self.close)
+        return self._pool
+
+    def scan(self, catalog, node):
+        lessons = catalog.lessons
+        if not self.parallel(len(lessons)):
+            check = compile_condition(node)
+            return [lesson for lesson in lessons if check(lesson)]
+        if self._version != catalog.version:
+            self._release_columns()
+            self._version = catalog.version
+        for field in condition_fields(node) - set(self.columns):
+            self.columns[field] = self._column(lessons, field)
+        # Колонки мають існувати до запуску пулу, щоб працівники успадкували той самий resource_tracker
+        columns = {field: tuple(block.name for block in self.columns[field]) for field in condition_fields(node)}
+        pool = self._executor()
+        step = -(-len(lessons) // self.workers)
+        futures = [pool.submit(scan_shared_columns, columns, node, start, min(start + step, len(lessons)))
+                   for start in range(0, len(lessons), step)]
+        return [lessons[i] for future in futures for i in future.result()]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self._release_columns()
+        self._version = None
+
+
+class QueryCache:
+    # LRU-кеш результатів запитів, обмежений кількістю записів і пам'яттю.
+    # Зміна уроку вилучає лише ті записи, умові яких відповідає стара або нова версія уроку.
+    def __init__(self, max_entries=128, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # ключ запиту -> (результат, умова, розмір)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, query, result):
+        result = tuple(result)
+        size = sys.getsizeof(result)
+        if size > self.max_bytes:
+            return result
+        self._drop(query.key)
+        self.entries[query.key] = (result, compile_condition(query.where), size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+        return result
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def on_change(self, event, lesson=None, previous=None):
+        if event in ("load", "reorder"):
+            # Від порядку каталогу залежать усі результати: невпорядковані повторюють його,
+            # а в упорядкованих він визначає порядок уроків з рівними ключами
+            self.clear()
+        elif event in ("edit_many", "delete_many"):
+            # Пакетна зміна: перевірка кожного запису на кожній версії, а якщо це дорожче за
+            # повторне виконання запитів — просто очищаємо кеш
+            versions = lesson + (previous or [])
+            if len(versions) * len(self.entries) > 100_000:
+                self.clear()
+            else:
+                for key in [key for key, entry in self.entries.items()
+                            if any(entry[1](version) for version in versions)]:
+                    self._drop(key)
+        elif lesson is not None:
+            versions = [version for version in (previous, lesson) if version is not None]
+            for key in [key for key, entry in self.entries.items()
+                        if any(entry[1](version) for version in versions)]:
+                self._drop(key)
+
+    def display(self):
+        total = self.hits + self.misses
+        ratio = self.hits / total * 100 if total else 0
+        print(f"Кеш запитів: записів {len(self.entries)}, ~{self.bytes / 1024:.1f} КБ, "
+              f"влучань {self.hits}, промахів {self.misses} ({ratio:.0f}% влучань), витіснено {self.evictions}")
+
+
 class Catalog:
-    def __init__(self, filename="catalog.json"):
+    def __init__(self, filename="catalog.json", codec="json", preloaded=None):
         self.filename = filename
+        self.codec = codec
+        # catalog.json -> catalog.descriptions, catalog.json.gz -> catalog.json.descriptions: стиснений
+        # каталог поруч зі звичайним не ділить з ним блоб описів
+        self.descriptions_filename = os.path.splitext(filename)[0] + ".descriptions"
         self.lessons = []
-        self.load_from_file()
+        self.stats = Aggregates()
+        self.index = LessonIndex()
+        self._descriptions = None
+        self._stamp = None
+        self._pending_upserts = {}
+        self._pending_deletes = set()
+        self._order_changed = False
+        self.listeners = []  # підписники на зміни: listener(event, lesson, previous)
+        self.version = 0  # зростає при кожній зміні вмісту каталогу
+        self.cache = QueryCache()
+        self.listeners.append(self.cache.on_change)
+        self.scanner = ParallelScanner()
+        self.load_from_file(preloaded)
 
     def find_lesson_index(self, lesson_id):
         for index, lesson in enumerate(self.lessons):
@@ -52,45 +1230,183 @@ class Catalog:
                 return index
         return -1
 
+    def _notify(self, event, lesson=None, previous=None):
+        self.version += 1
+        for listener in self.listeners:
+            listener(event, lesson, previous)
+
+    # Підсумки та індекси оновлюються до збереження; після злиття з диска вони перебудовуються
+    def _track(self, lesson):
+        self.stats.add(lesson)
+        self.index.add(lesson)
+
+    def _untrack(self, lesson):
+        self.stats.remove(lesson)
+        self.index.remove(lesson)
+
+    def _retrack(self, previous, lesson):
+        self.stats.replace(previous, lesson)
+        self.index.replace(previous, lesson)
+
+    def _rebuild_indexes(self):
+        self.stats = Aggregates(self.lessons)
+        self.index = LessonIndex(self.lessons)
+
+    def get_lesson(self, lesson_id):
+        return self.index.by_id.get(lesson_id)
+
+    def ensure_loaded(self, where=None):
+        # Звичайний каталог завантажено повністю; ShardedCatalog тут догружає потрібні шарди
+        pass
+
+    def is_empty(self):
+        return not self.lessons
+
+    def import_lessons(self, lessons):
+        # Перенесення уроків з іншого каталогу (у шарди, в інший формат чи стиснений файл)
+        for lesson in lessons:
+            self.lessons.append(lesson)
+            self._pending_upserts[lesson.id] = lesson
+        self._rebuild_indexes()
+        self.save_to_file()
+        self._notify("load")
+
     def add_lesson(self, lesson):
+        self.refresh_if_changed()
         self.lessons.append(lesson)
+        self._track(lesson)
+        self._pending_upserts[lesson.id] = lesson
         self.save_to_file()
+        self._notify("add", lesson)
+
+    @staticmethod
+    def _apply_edit(lesson, title=None, description=None, author=None, duration=None, category=None):
+        if title is not None and title.strip() != "":
+            lesson.title = title
+        if description is not None and description.strip() != "":
+            lesson.description = description
+        if author is not None and author.strip() != "":
+            lesson.author = author
+        if duration is not None:
+            lesson.duration = duration
+        if category is not None and category.strip() != "":
+            lesson.category = category
 
     def edit_lesson(self, lesson_id, title=None, description=None, author=None, duration=None, category=None):
-        index = self.find_lesson_index(lesson_id)
-        if index != -1:
-            lesson = self.lessons[index]
-            if title is not None and title.strip() != "":
-                lesson.title = title
-            if description is not None and description.strip() != "":
-                lesson.description = description
-            if author is not None and author.strip() != "":
-                lesson.author = author
-            if duration is not None:
-                lesson.duration = duration
-            if category is not None and category.strip() != "":
-                lesson.category = category
+        self.refresh_if_changed()
+        # Позиція уроку не потрібна, тож шукаємо за індексом ID, а не переглядом списку
+        lesson = self.get_lesson(lesson_id)
+        if lesson is not None:
+            previous = copy.copy(lesson)
+            self._apply_edit(lesson, title, description, author, duration, category)
+            self._retrack(previous, lesson)
+            self._pending_upserts[lesson.id] = lesson
             self.save_to_file()
+            self._notify("edit", lesson, previous)
         else:
             print("Неправильний ID уроку для редагування.")
 
     def delete_lesson(self, lesson_id):
+        self.refresh_if_changed()
         index = self.find_lesson_index(lesson_id)
         if index != -1:
-            del self.lessons[index]
+            lesson = self.lessons.pop(index)
+            self._untrack(lesson)
+            self._pending_upserts.pop(lesson_id, None)
+            self._pending_deletes.add(lesson_id)
             self.save_to_file()
+            self._notify("delete", lesson)
         else:
             print("Неправильний ID уроку для видалення.")
 
-    def filter_lessons(self, category=None, author=None):
-        filtered = self.lessons
+    def select_lessons(self, ids=None, where=None):
+        # Уроки для пакетної операції: за набором ID (через індекс) і/або за умовою — рядком запиту
+        # (планувальник використає індекси) чи функцією-предикатом
+        if ids is None and where is None:
+            raise ValueError("Потрібні ID уроків або умова відбору")
+        self.refresh_if_changed()
+        if ids is not None:
+            lessons = [lesson for lesson in map(self.get_lesson, dict.fromkeys(ids)) if lesson is not None]
+            if isinstance(where, str):
+                check = compile_condition(Query.parse(where).where)
+                lessons = [lesson for lesson in lessons if check(lesson)]
+        elif isinstance(where, str):
+            lessons = list(self.query(where))
+        else:
+            self.ensure_loaded()
+            lessons = self.lessons
+        if callable(where):
+            lessons = [lesson for lesson in lessons if where(lesson)]
+        return lessons
+
+    def edit_lessons(self, ids=None, where=None, title=None, description=None, author=None, duration=None,
+                     category=None):
+        # Усі зміни за один прохід: індекси оновлюються пакетом, файл записується один раз,
+        # а підписники отримують одну подію "edit_many" зі списками нових і попередніх версій
+        lessons = self.select_lessons(ids, where)
+        if not lessons:
+            return 0
+        previous = [copy.copy(lesson) for lesson in lessons]
+        for lesson in lessons:
+            self._apply_edit(lesson, title, description, author, duration, category)
+            self._pending_upserts[lesson.id] = lesson
+        for old, lesson in zip(previous, lessons):
+            self.stats.replace(old, lesson)
+        self.index.replace_many(previous, lessons)
+        self.save_to_file()
+        self._notify("edit_many", lessons, previous)
+        return len(lessons)
+
+    def delete_lessons(self, ids=None, where=None):
+        lessons = self.select_lessons(ids, where)
+        if not lessons:
+            return 0
+        removed = {lesson.id for lesson in lessons}
+        self.lessons = [lesson for lesson in self.lessons if lesson.id not in removed]
+        for lesson in lessons:
+            self.stats.remove(lesson)
+            self._pending_upserts.pop(lesson.id, None)
+            self._pending_deletes.add(lesson.id)
+        self.index.remove_many(lessons)
+        self.save_to_file()
+        self._notify("delete_many", lessons)
+        return len(lessons)
+
+    def filter_lessons(self, category=None, author=None, min_duration=None, max_duration=None):
+        # Фільтр виконується як запит: планувальник обере індекс, а результат потрапить у кеш
+        conditions = []
         if category:
-            filtered = [lesson for lesson in filtered if lesson.category.lower() == category.lower()]
+            conditions.append(("cmp", "category", "=", category.lower()))
         if author:
-            filtered = [lesson for lesson in filtered if lesson.author.lower() == author.lower()]
-        return filtered
+            conditions.append(("cmp", "author", "=", author.lower()))
+        if min_duration is not None:
+            conditions.append(("cmp", "duration", ">=", min_duration))
+        if max_duration is not None:
+            conditions.append(("cmp", "duration", "<=", max_duration))
+        where = None
+        if conditions:
+            where = conditions[0] if len(conditions) == 1 else ("and", conditions)
+        return self.query(Query(normalize_condition(where)))
+
+    def plan_query(self, text):
+        query = text if isinstance(text, Query) else Query.parse(text)
+        self.ensure_loaded(query.where)
+        return QueryPlanner(self.index, len(self.lessons), self.scanner).plan(query)
+
+    def query(self, text):
+        self.refresh_if_changed()
+        query = text if isinstance(text, Query) else Query.parse(text)
+        result = self.cache.get(query.key)
+        if result is None:
+            result = self.cache.put(query, self.plan_query(query).execute(self))
+        return list(result)
+
+    def explain(self, text):
+        self.refresh_if_changed()
+        return "\n".join(self.plan_query(text).explain())
 
     def sort_lessons(self):
+        self.refresh_if_changed()
         print("Виберіть критерій сортування:")
         print("1. Тривалість")
         print("2. Назва")
@@ -102,57 +1418,946 @@ class Catalog:
             print("1. Від меншого до більшого")
             print("2. Від більшого до меншого")
             order_choice = input("Введіть номер порядку: ")
-            reverse = order_choice == '2'
-            self.lessons.sort(key=lambda lesson: lesson.duration, reverse=reverse)
+            self.apply_sort("duration", reverse=order_choice == '2')
             print("Уроки відсортовано за тривалістю.")
         elif choice == '2':
             print("Оберіть порядок сортування за назвою:")
             print("1. За алфавітом")
             print("2. За зворотному алфавіті")
             order_choice = input("Введіть номер порядку: ")
-            reverse = order_choice == '2'
-            self.lessons = natsorted(self.lessons, key=lambda lesson: lesson.title, reverse=reverse)
+            self.apply_sort("title", reverse=order_choice == '2')
             print("Уроки відсортовано за назвою.")
         elif choice == '3':
             print("Оберіть порядок сортування за автором:")
             print("1. За алфавітом")
             print("2. За зворотному алфавіті")
             order_choice = input("Введіть номер порядку: ")
-            reverse = order_choice == '2'
-            self.lessons = natsorted(self.lessons, key=lambda lesson: lesson.author, reverse=reverse)
+            self.apply_sort("author", reverse=order_choice == '2')
             print("Уроки відсортовано за автором.")
         else:
-            print("Неправильний вибір критерію сортування.")
-            return
+            print("Неправильний вибір критерію сортування.")
+
+    def apply_sort(self, field, reverse=False):
+        # Стабільне сортування вже відсортованого каталогу нічого не змінює, тож новий порядок
+        # кладемо в кеш запитів: повторне сортування за тим самим полем його й візьме
+        query = Query(order_by=field, descending=reverse)
+        self.lessons = self.query(query)
+        self.index.renumber(self.lessons)
+        self._order_changed = True
+        self.save_to_file()
+        self._notify("reorder")
+        self.cache.put(query, self.lessons)
+
+    def display_statistics(self):
+        self.refresh_if_changed()
+        self.ensure_loaded()
+        self.stats.display()
+
+    def display_lessons(self):
+        self.refresh_if_changed()
+        self.ensure_loaded()
+        if not self.lessons:
+            print("Каталог порожній.")
+            return
+        for lesson in self.lessons:
+            print(lesson)
+
+    def refresh_if_changed(self):
+        # Перечитуємо файл лише тоді, коли його змінив інший процес
+        if file_stamp(self.filename) != self._stamp:
+            self.load_from_file()
+
+    def _read_lessons(self, rows):
+        store = self._descriptions = DescriptionStore(self.descriptions_filename)
+        if rows and isinstance(rows[0], dict):
+            # Старий формат файлу зі словниками
+            lessons = [VideoLesson.from_dict(item, store) for item in rows]
+        else:
+            lessons = [decode_stored_lesson(row, store) for row in rows]
+        store.check(max((lesson.description_ref[1] + lesson.description_ref[2] for lesson in lessons
+                         if lesson.description_ref is not None), default=0))
+        return lessons
+
+    def _store_descriptions(self):
+        # Дописуємо в блоб лише нові/змінені описи та ті, що посилаються на старий блоб
+        store = self._descriptions
+        pending = [lesson for lesson in self.lessons
+                   if lesson.description_ref is None or lesson.description_ref[0] is not store]
+        refs = store.append_many([lesson.description or "" for lesson in pending])
+        for lesson, ref in zip(pending, refs):
+            lesson.description_ref = ref
+            lesson._description = None
+        live = sum(lesson.description_ref[2] for lesson in self.lessons)
+        if store.size() > 2 * live + 65536:
+            self._compact_descriptions()
+
+    def _compact_descriptions(self):
+        texts = [lesson.description for lesson in self.lessons]
+        data = [text.encode("utf-8") for text in texts]
+        atomic_write(self.descriptions_filename, lambda f: f.write(b"".join(data)), binary=True)
+        store = DescriptionStore(self.descriptions_filename)
+        offset = 0
+        for lesson, chunk in zip(self.lessons, data):
+            lesson.description_ref = (store, offset, len(chunk))
+            lesson._description = None
+            offset += len(chunk)
+        self._descriptions = store
+
+    def load_from_file(self, preloaded=None):
+        # preloaded — (штамп, записи), заздалегідь прочитані, наприклад, паралельно в іншому процесі
+        try:
+            self._stamp, rows = preloaded or read_records_locked(self.filename)
+            lessons = self._read_lessons(rows)
+            # Незбережені локальні зміни не губимо при перечитуванні
+            order = [lesson.id for lesson in self.lessons] if self._order_changed else None
+            self.lessons = merge_records(lessons, self._pending_upserts, self._pending_deletes, order)
+        except Exception as e:
+            print(f"Помилка завантаження файлу: {e}")
+            self.lessons = []
+        self._rebuild_indexes()
+        self._notify("load")
+
+    def save_to_file(self):
+        try:
+            with file_lock(self.filename, exclusive=True):
+                if file_stamp(self.filename) != self._stamp:
+                    # Файл змінив інший процес: зливаємо його зміни з нашими, а не затираємо
+                    order = [lesson.id for lesson in self.lessons] if self._order_changed else None
+                    self.lessons = merge_records(self._read_lessons(read_records_cached(self.filename)),
+                                                 self._pending_upserts, self._pending_deletes, order)
+                    self._rebuild_indexes()
+                    self._notify("load")
+                self._store_descriptions()
+                rows = [encode_stored_lesson(lesson) for lesson in self.lessons]
+                write_records(self.filename, rows, self.codec)
+                write_snapshot(self.filename, rows)
+                self._stamp = file_stamp(self.filename)
+            self._pending_upserts.clear()
+            self._pending_deletes.clear()
+            self._order_changed = False
+        except Exception as e:
+            print(f"Помилка збереження файлу: {e}")
+
+
+def shard_key(category):
+    return (category or "").lower()
+
+
+class ShardedCatalog(Catalog):
+    # Каталог, розбитий на файли за категоріями: manifest.json перелічує шарди, а кожен шард —
+    # звичайний Catalog зі своїм файлом описів і знімком. Шард завантажується лише тоді, коли його
+    # зачіпає запит або пошук уроку; при збереженні записуються тільки змінені шарди.
+    # Порядок уроків зберігається в межах категорії.
+    MANIFEST_FORMAT = "sharded-catalog"
+
+    def __init__(self, directory="catalog.shards", codec="json", workers=None):
+        self.directory = directory
+        self.workers = workers  # скільки процесів розбирають шарди одночасно; None або 1 — послідовно
+        self.manifest = {}  # ключ шарда (категорія в нижньому регістрі) -> {"category", "file"}
+        self.shards = {}  # завантажені шарди: ключ -> Catalog
+        self._lesson_shards = {}  # ID уроку -> ключ шарда, в якому він збережений
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(os.path.join(directory, "manifest.json"), codec)
+
+    def _read_manifest(self):
+        if not os.path.exists(self.filename):
+            return {}
+        with open(self.filename, "r", encoding="utf-8") as f:
+            return json.load(f).get("shards", {})
+
+    def _write_manifest(self):
+        data = {"format": self.MANIFEST_FORMAT, "shards": self.manifest}
+        atomic_write(self.filename, lambda f: json.dump(data, f, ensure_ascii=False, indent=4))
+
+    def _shard_filename(self, key):
+        return os.path.join(self.directory, self.manifest[key]["file"])
+
+    def _open_shard(self, key, category=None, preloaded=None):
+        # Новий шард лише реєструється в маніфесті; файл з'явиться при першому збереженні
+        if key not in self.manifest:
+            digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+            self.manifest[key] = {"category": category, "file": f"shard-{digest}.json"}
+        shard = self.shards[key] = Catalog(self._shard_filename(key), self.codec, preloaded)
+        for lesson in shard.lessons:
+            self._lesson_shards[lesson.id] = key
+        self.lessons.extend(shard.lessons)
+        return shard
+
+    def _open_shards(self, keys):
+        # Розбір файлів — CPU-робота, тому кілька шардів читаємо в пулі процесів; назад передаються
+        # лише кортежі записів, а об'єкти уроків будуються вже тут
+        preloaded = [None] * len(keys)
+        if self.workers and self.workers > 1 and len(keys) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(keys))) as pool:
+                preloaded = list(pool.map(read_records_locked, map(self._shard_filename, keys)))
+        return [self._open_shard(key, preloaded=rows) for key, rows in zip(keys, preloaded)]
+
+    def _shards_for(self, node):
+        # Які шарди можуть містити результат: умову на категорію перевіряємо прямо на ключах маніфесту
+        if node is None or node[0] == "not":
+            return set(self.manifest)
+        if node[0] == "cmp":
+            _, field, op, value = node
+            if field != "category":
+                return set(self.manifest)
+            compare = COMPARISONS[op]
+            return {key for key in self.manifest if compare(key, value)}
+        parts = [self._shards_for(child) for child in node[1]]
+        return set.intersection(*parts) if node[0] == "and" else set.union(*parts)
+
+    def ensure_loaded(self, where=None):
+        wanted = self._shards_for(where)
+        opened = self._open_shards([key for key in self.manifest if key not in self.shards and key in wanted])
+        if opened:
+            self._rebuild_indexes()
+            self._notify("load")
+
+    def _find_shard(self, lesson_id):
+        # Незавантажені шарди відкриваємо по одному, доки не знайдеться потрібний урок
+        if lesson_id in self.index.by_id:
+            return
+        for key in list(self.manifest):
+            if key not in self.shards and self._open_shard(key).get_lesson(lesson_id) is not None:
+                self._rebuild_indexes()
+                self._notify("load")
+                return
+
+    def get_lesson(self, lesson_id):
+        self._find_shard(lesson_id)
+        return super().get_lesson(lesson_id)
+
+    def find_lesson_index(self, lesson_id):
+        self._find_shard(lesson_id)
+        return super().find_lesson_index(lesson_id)
+
+    def is_empty(self):
+        return not self.manifest and not self.lessons
+
+    def refresh_if_changed(self):
+        changed = file_stamp(self.filename) != self._stamp
+        for shard in self.shards.values():
+            version = shard.version
+            shard.refresh_if_changed()
+            changed = changed or shard.version != version
+        if changed:
+            self.load_from_file()
+
+    def _collect_lessons(self):
+        self.lessons = [lesson for shard in self.shards.values() for lesson in shard.lessons]
+        self._lesson_shards = {lesson.id: key for key, shard in self.shards.items() for lesson in shard.lessons}
+
+    def load_from_file(self, preloaded=None):
+        try:
+            with file_lock(self.filename):
+                self.manifest = self._read_manifest()
+                self._stamp = file_stamp(self.filename)
+            for key in list(self.shards):
+                if key not in self.manifest:
+                    del self.shards[key]
+            for shard in self.shards.values():
+                shard.refresh_if_changed()
+            order = [lesson.id for lesson in self.lessons] if self._order_changed else None
+            self._collect_lessons()
+            self.lessons = merge_records(self.lessons, self._pending_upserts, self._pending_deletes, order)
+        except Exception as e:
+            print(f"Помилка завантаження файлу: {e}")
+            self.lessons = []
+        self._rebuild_indexes()
+        self._notify("load")
+
+    def save_to_file(self):
+        opened = merged = False
+        try:
+            with file_lock(self.filename, exclusive=True):
+                # Маніфест перечитуємо під блокуванням: інший процес міг додати нові шарди
+                manifest = self._read_manifest()
+                for key in self.shards:
+                    manifest.setdefault(key, self.manifest[key])
+                self.manifest = manifest
+                dirty = set(self.shards) if self._order_changed else set()
+                for lesson_id in self._pending_deletes:
+                    key = self._lesson_shards.pop(lesson_id, None)
+                    if key is not None:
+                        self.shards[key]._pending_deletes.add(lesson_id)
+                        dirty.add(key)
+                for lesson in self._pending_upserts.values():
+                    key = shard_key(lesson.category)
+                    previous_key = self._lesson_shards.get(lesson.id)
+                    if previous_key is not None and previous_key != key:
+                        # Категорію змінено: урок переїжджає в інший шард
+                        self.shards[previous_key]._pending_deletes.add(lesson.id)
+                        dirty.add(previous_key)
+                    if key not in self.shards:
+                        self._open_shard(key, lesson.category)
+                        opened = True
+                    self.shards[key]._pending_upserts[lesson.id] = lesson
+                    self._lesson_shards[lesson.id] = key
+                    dirty.add(key)
+                groups = {key: [] for key in dirty}
+                for lesson in self.lessons:
+                    key = self._lesson_shards.get(lesson.id)
+                    if key in groups:
+                        groups[key].append(lesson)
+                for key in dirty:
+                    shard = self.shards[key]
+                    version = shard.version
+                    shard.lessons = groups[key]
+                    shard._order_changed = True
+                    shard.save_to_file()
+                    merged = merged or shard.version != version
+                # Порожні шарди прибираємо лише після збереження решти: описи уроків, що переїхали
+                # в інший шард, читаються ще зі старого файлу описів
+                for key in dirty:
+                    shard = self.shards[key]
+                    if not shard.lessons:
+                        del self.shards[key]
+                        del self.manifest[key]
+                        # Замок шарда теж прибираємо: записи в шарди йдуть лише під замком маніфесту
+                        for filename in (shard.filename, shard.descriptions_filename,
+                                         snapshot_filename(shard.filename), shard.filename + ".lock"):
+                            if os.path.exists(filename):
+                                os.remove(filename)
+                self._write_manifest()
+                self._stamp = file_stamp(self.filename)
+            self._pending_upserts.clear()
+            self._pending_deletes.clear()
+            self._order_changed = False
+        except Exception as e:
+            print(f"Помилка збереження файлу: {e}")
+        if merged:
+            # Інший процес змінив шард: беремо злиті уроки з шардів
+            self._collect_lessons()
+        if opened or merged:
+            self._rebuild_indexes()
+            self._notify("load")
+
+
+class CatalogAnalytics:
+    # Колонкове представлення каталогу в масивах NumPy; звіти кешуються до наступної зміни каталогу
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._version = None
+        self._reports = {}
+
+    def _columns(self):
+        self.catalog.ensure_loaded()
+        if self._version != self.catalog.version:
+            import numpy as np
+            lessons = self.catalog.lessons
+            self.durations = np.fromiter((lesson.duration or 0 for lesson in lessons), dtype=np.int64,
+                                         count=len(lessons))
+            self.category_codes, self.categories = self._factorize(np, [lesson.category for lesson in lessons])
+            self.author_codes, self.authors = self._factorize(np, [lesson.author for lesson in lessons])
+            self._version = self.catalog.version
+            self._reports = {}
+        return self
+
+    @staticmethod
+    def _factorize(np, values):
+        codes = {}
+        array = np.fromiter((codes.setdefault(value, len(codes)) for value in values), dtype=np.int64,
+                            count=len(values))
+        return array, list(codes)
+
+    def _cached(self, key, build):
+        self._columns()
+        if key not in self._reports:
+            self._reports[key] = build()
+        return self._reports[key]
+
+    def by_author(self):
+        def build():
+            import numpy as np
+            size = len(self.authors)
+            counts = np.bincount(self.author_codes, minlength=size)
+            minutes = np.bincount(self.author_codes, weights=self.durations, minlength=size)
+            order = np.argsort(-minutes, kind="stable")
+            return [(self.authors[i], int(counts[i]), int(minutes[i])) for i in order]
+        return self._cached("by_author", build)
+
+    def duration_histogram(self, edges=(0, 15, 30, 45, 60, 90, 120)):
+        def build():
+            import numpy as np
+            bins = np.asarray(edges)
+            # Номер кошика (останній — "більше за останню межу") і код категорії зводимо в один індекс
+            bin_index = np.searchsorted(bins, self.durations, side="right") - 1
+            bin_index = np.clip(bin_index, 0, len(bins) - 1)
+            flat = self.category_codes * len(bins) + bin_index
+            table = np.bincount(flat, minlength=len(self.categories) * len(bins))
+            table = table.reshape(len(self.categories), len(bins))
+            return [(category, table[i].tolist()) for i, category in enumerate(self.categories)]
+        return self._cached(("histogram", tuple(edges)), build)
+
+    def percentiles(self, quantiles=(50, 90, 99)):
+        def build():
+            import numpy as np
+            if not len(self.durations):
+                return []
+            rows = [("Усі категорії", np.percentile(self.durations, quantiles).tolist())]
+            order = np.argsort(self.category_codes, kind="stable")
+            groups = np.split(self.durations[order], np.flatnonzero(np.diff(self.category_codes[order])) + 1)
+            codes = np.unique(self.category_codes)
+            for code, group in zip(codes, groups):
+                rows.append((self.categories[code], np.percentile(group, quantiles).tolist()))
+            return rows
+        return self._cached(("percentiles", tuple(quantiles)), build)
+
+    def display_by_author(self):
+        print(f"{'Автор':<24}{'Уроків':>8}{'Хвилин':>10}")
+        for author, count, minutes in self.by_author():
+            print(f"{author:<24}{count:>8}{minutes:>10}")
+
+    def display_histogram(self, edges=(0, 15, 30, 45, 60, 90, 120)):
+        labels = [f"{low}-{high}" for low, high in zip(edges, edges[1:])] + [f"{edges[-1]}+"]
+        print(f"{'Категорія':<20}" + "".join(f"{label:>9}" for label in labels))
+        for category, counts in self.duration_histogram(edges):
+            print(f"{category:<20}" + "".join(f"{count:>9}" for count in counts))
+
+    def display_percentiles(self, quantiles=(50, 90, 99)):
+        print(f"{'Категорія':<20}" + "".join(f"{'p' + str(q):>9}" for q in quantiles))
+        for category, values in self.percentiles(quantiles):
+            print(f"{category:<20}" + "".join(f"{value:>9.1f}" for value in values))
+
+
+def normalize_text(text):
+    return " ".join((text or "").casefold().split())
+
+
+def content_hash(lesson):
+    # Точний дублікат — той самий вміст без урахування регістру та зайвих пробілів, ID не враховується
+    parts = (lesson.title, lesson.description, lesson.author, lesson.category)
+    data = "\x1f".join([normalize_text(part) for part in parts] + [str(lesson.duration or 0)])
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).digest()
+
+
+def shingle_hashes(np, lesson, size=5):
+    # 32-бітні хеші всіх шинглів (підрядків із size символів) назви й опису; повтори шинглів
+    # не прибираємо — мінімум MinHash від них не залежить
+    text = normalize_text(f"{lesson.title} {lesson.description or ''}")
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    size = max(1, min(size, len(codes)))
+    count = max(1, len(codes) - size + 1)
+    hashes = np.zeros(count, dtype=np.uint32)
+    for j in range(min(size, len(codes))):
+        hashes = hashes * np.uint32(1000003) + codes[j:j + count]
+    # Перемішуємо біти (фіналізатор murmur3), щоб схожі шингли не давали близьких хешів
+    hashes ^= hashes >> np.uint32(16)
+    hashes *= np.uint32(0x85EBCA6B)
+    hashes ^= hashes >> np.uint32(13)
+    return hashes
+
+
+class Deduplicator:
+    # Точні дублікати групуються за хешем вмісту. Для схожих уроків рахуємо MinHash-підписи шинглів
+    # назви й опису, а кандидатів шукаємо через LSH: підпис ділиться на смуги, і порівнюються лише уроки,
+    # що збіглися хоча б в одній смузі, — без перебору всіх пар. Залишається урок, що йде першим у каталозі.
+    # Схожість тексту сама по собі не робить уроки дублікатами: серія "Урок 1", "Урок 2", ... з шаблонним
+    # описом дуже схожа, тож додатково мають збігатися автор і категорія, тривалість — бути близькою,
+    # а назви не повинні відрізнятися лише числами (номер частини серії).
+    PERMUTATIONS = 64
+    BANDS = 16
+    DURATION_TOLERANCE = 0.1  # частка довшої тривалості, але не менше 2 хв.
+
+    def __init__(self, catalog, threshold=0.7):
+        self.catalog = catalog
+        self.threshold = threshold
+        self._version = None
+        self._report = None
+
+    def exact_groups(self, lessons):
+        groups = {}
+        for lesson in lessons:
+            groups.setdefault(content_hash(lesson), []).append(lesson)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def signatures(self, lessons, batch=200_000):
+        import numpy as np
+        # "Перестановки" — афінні відображення (a * h + b) mod 2**32 з непарним a: це бієкції 32-бітного
+        # простору, а 32-бітна арифметика вдвічі зменшує обсяг проміжних масивів
+        rng = np.random.default_rng(42)
+        a = rng.integers(0, 2 ** 31, size=(self.PERMUTATIONS, 1), dtype=np.uint32) * np.uint32(2) + np.uint32(1)
+        b = rng.integers(0, 2 ** 32, size=(self.PERMUTATIONS, 1), dtype=np.uint32)
+        hashes = [shingle_hashes(np, lesson) for lesson in lessons]
+        result = np.empty((len(lessons), self.PERMUTATIONS), dtype=np.uint32)
+        # Шингли кількох уроків обробляються одним масивом, мінімум по кожному уроку — через reduceat
+        start = 0
+        while start < len(lessons):
+            end, total = start, 0
+            while end < len(lessons) and (end == start or total + len(hashes[end]) <= batch):
+                total += len(hashes[end])
+                end += 1
+            values = np.concatenate(hashes[start:end])
+            offsets = np.cumsum([0] + [len(h) for h in hashes[start:end - 1]])
+            permuted = a * values[None, :] + b
+            result[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            start = end
+        return result
+
+    def compatible(self, lesson, other):
+        first, second = lesson.duration or 0, other.duration or 0
+        if abs(first - second) > max(2, self.DURATION_TOLERANCE * max(first, second)):
+            return False
+        titles = [normalize_text(lesson.title), normalize_text(other.title)]
+        series = NUMBER_RUN.sub("#", titles[0]) == NUMBER_RUN.sub("#", titles[1]) and titles[0] != titles[1]
+        return not series
+
+    def near_groups(self, lessons):
+        import numpy as np
+        if len(lessons) < 2:
+            return []
+        signatures = self.signatures(lessons)
+        # Номер блоку (автор, категорія) додається до ключа кожної смуги, тож кандидатами стають
+        # лише уроки одного автора в одній категорії
+        blocks = {}
+        block_ids = np.array([blocks.setdefault((normalize_text(lesson.author), normalize_text(lesson.category)),
+                                                len(blocks)) for lesson in lessons], dtype=np.uint32)
+        parent = list(range(len(lessons)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        rows = self.PERMUTATIONS // self.BANDS
+        for band in range(self.BANDS):
+            keys = np.ascontiguousarray(np.column_stack([signatures[:, band * rows:(band + 1) * rows], block_ids]))
+            keys = keys.view(np.dtype((np.void, keys.itemsize * (rows + 1)))).ravel()
+            _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            order = np.argsort(inverse, kind="stable")
+            ends = np.cumsum(counts)
+            for end, count in zip(ends[counts > 1].tolist(), counts[counts > 1].tolist()):
+                bucket = order[end - count:end]
+                # Кандидатів у кошику порівнюємо з першим (найранішим) уроком, а не кожну пару
+                similarity = (signatures[bucket] == signatures[bucket[0]]).mean(axis=1)
+                anchor = find(bucket[0])
+                for i in bucket[1:][similarity[1:] >= self.threshold].tolist():
+                    if not self.compatible(lessons[bucket[0]], lessons[i]):
+                        continue
+                    root = find(i)
+                    if root != anchor:
+                        parent[max(root, anchor)] = min(root, anchor)
+                        anchor = min(root, anchor)
+        clusters = {}
+        for i in range(len(lessons)):
+            clusters.setdefault(find(i), []).append(i)
+        groups = []
+        for members in clusters.values():
+            if len(members) > 1:
+                similarity = (signatures[members] == signatures[members[0]]).mean(axis=1)
+                groups.append([(lessons[i], float(value)) for i, value in zip(members, similarity)])
+        return groups
+
+    def report(self):
+        # (точні групи, схожі групи або None без numpy); перераховується лише після змін каталогу
+        self.catalog.refresh_if_changed()
+        self.catalog.ensure_loaded()
+        if self._version != self.catalog.version:
+            lessons = self.catalog.lessons
+            exact = self.exact_groups(lessons)
+            duplicates = {lesson.id for group in exact for lesson in group[1:]}
+            try:
+                near = self.near_groups([lesson for lesson in lessons if lesson.id not in duplicates])
+            except ImportError:
+                near = None
+            self._report = (exact, near)
+            self._version = self.catalog.version
+        return self._report
+
+    def display_report(self, playlist_manager=None):
+        exact, near = self.report()
+        print(f"Точні дублікати: груп {len(exact)}")
+        for group in exact:
+            print(f"  Залишається: {group[0].title} (ID: {group[0].id})")
+            for lesson in group[1:]:
+                print(f"    - {lesson.title} (ID: {lesson.id})")
+        if near is None:
+            print("Для пошуку схожих уроків необхідна бібліотека numpy.")
+        else:
+            print(f"Схожі уроки (поріг {self.threshold:.2f}): груп {len(near)}")
+            for group in near:
+                print(f"  Залишається: {group[0][0].title} (ID: {group[0][0].id})")
+                for lesson, similarity in group[1:]:
+                    print(f"    - {similarity:.2f} {lesson.title} (ID: {lesson.id})")
+        if playlist_manager is not None:
+            for playlist in playlist_manager.playlists.values():
+                for lesson, count in playlist.repeats():
+                    print(f"Повтор у плейлисті {playlist.name}: {lesson.title} x{count}")
+
+    def merge(self, playlist_manager, near=False):
+        # Дублікати видаляються з каталогу, а їхні входження в плейлистах переходять до уроку, що залишився.
+        # Схожі (не точні) дублікати зливаються лише на явний запит
+        exact, near_groups = self.report()
+        groups = [list(group) for group in exact]
+        if near and near_groups:
+            groups += [[lesson for lesson, _ in group] for group in near_groups]
+        removed = []
+        repeats = 0
+        for survivor, *duplicates in groups:
+            repeats += playlist_manager.merge_lessons(survivor, [lesson.id for lesson in duplicates])
+            removed.extend(lesson.id for lesson in duplicates)
+        # Усі дублікати видаляються одним пакетом і одним записом файлу
+        if removed:
+            self.catalog.delete_lessons(removed)
+        return len(removed), repeats + playlist_manager.collapse_repeats()
+
+
+LESSON_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class SimilarityIndex:
+    # TF-IDF за назвою (подвійна вага), описом, категорією та автором, косинусна схожість top-k у NumPy.
+    # Для кожного уроку зберігаються лише частоти термінів і хеш вмісту, df ведеться інкрементно, а idf
+    # та норми рахуються під час запиту, тож додавання чи редагування уроку не перераховує всю матрицю.
+    # Змінений урок дописується в кінець CSR-масивів, а його старий рядок лише позначається мертвим.
+    # Частоти кешуються на диску (записуються при виході з програми) й при запуску звіряються за хешем вмісту.
+    def __init__(self, catalog, cache_filename=None):
+        import atexit
+        self.catalog = catalog
+        self.cache_filename = cache_filename or os.path.splitext(catalog.descriptions_filename)[0] + ".tfidf"
+        self.vocabulary = {}  # термін -> номер стовпця
+        self.terms = []
+        self.df = []  # номер терміна -> у скількох уроках він трапляється
+        self.rows = {}  # ID уроку -> (хеш вмісту, номери термінів, частоти)
+        self._pending = None  # ID уроків, змінених після останньої звірки; None — звірити всі
+        self._matrix = None
+        self._dirty = False  # кеш на диску застарів
+        self._load_cache()
+        catalog.listeners.append(self.on_change)
+        atexit.register(self.flush)
+
+    @staticmethod
+    def tokens(lesson):
+        counts = {}
+        for text, weight in ((lesson.title, 2), (lesson.description, 1)):
+            for token in LESSON_TOKEN.findall((text or "").casefold()):
+                counts[token] = counts.get(token, 0) + weight
+        # Категорія та автор — окремі терміни, щоб не змішуватися зі словами тексту
+        for prefix, value in (("категорія:", lesson.category), ("автор:", lesson.author)):
+            token = prefix + normalize_text(value)
+            counts[token] = counts.get(token, 0) + 1
+        return counts
+
+    def _add_row(self, lesson, digest):
+        ids, counts = [], []
+        for term, count in self.tokens(lesson).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                term_id = self.vocabulary[term] = len(self.terms)
+                self.terms.append(term)
+                self.df.append(0)
+            self.df[term_id] += 1
+            ids.append(term_id)
+            counts.append(count)
+        self.rows[lesson.id] = (digest, ids, counts)
+        if self._matrix is not None:
+            self._matrix.append(lesson.id, ids, counts)
+
+    def _remove_row(self, lesson_id):
+        row = self.rows.pop(lesson_id, None)
+        if row is not None:
+            for term_id in row[1]:
+                self.df[term_id] -= 1
+            if self._matrix is not None:
+                self._matrix.remove(lesson_id)
+
+    def _update(self, lesson):
+        # Повертає True, якщо рядок уроку довелося перебудувати
+        digest = content_hash(lesson)
+        row = self.rows.get(lesson.id)
+        if row is not None and row[0] == digest:
+            return False
+        self._remove_row(lesson.id)
+        self._add_row(lesson, digest)
+        return True
+
+    def on_change(self, event, lesson=None, previous=None):
+        if event == "load":
+            self._pending = None
+        elif event in ("add", "edit", "delete") and self._pending is not None:
+            self._pending.add(lesson.id)
+        elif event in ("edit_many", "delete_many") and self._pending is not None:
+            self._pending.update(lesson.id for lesson in lesson)
+
+    def sync(self):
+        self.catalog.refresh_if_changed()
+        if self._pending is None:
+            self.catalog.ensure_loaded()
+            current = {lesson.id: lesson for lesson in self.catalog.lessons}
+            stale = [lesson_id for lesson_id in self.rows if lesson_id not in current]
+            for lesson_id in stale:
+                self._remove_row(lesson_id)
+            updated = [self._update(lesson) for lesson in current.values()]
+            changed = bool(stale) or any(updated)
+        else:
+            changed = False
+            for lesson_id in self._pending:
+                lesson = self.catalog.get_lesson(lesson_id)
+                if lesson is None:
+                    changed = changed or lesson_id in self.rows
+                    self._remove_row(lesson_id)
+                else:
+                    changed = self._update(lesson) or changed
+        self._pending = set()
+        self._dirty = self._dirty or changed
+        # Ущільнюємо матрицю, коли мертвих рядків стало більше, ніж живих
+        if self._matrix is not None and self._matrix.dead > len(self.rows):
+            self._matrix = None
+
+    def flush(self):
+        if self._dirty:
+            self._save_cache()
+            self._dirty = False
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_filename, "rb") as f:
+                data = marshal.load(f)
+            self.terms, self.df, self.rows = data["terms"], data["df"], data["rows"]
+            self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            self.vocabulary, self.terms, self.df, self.rows = {}, [], [], {}
+
+    def _save_cache(self):
+        data = {"terms": self.terms, "df": self.df, "rows": self.rows}
+        try:
+            atomic_write(self.cache_filename, lambda f: marshal.dump(data, f), binary=True)
+        except OSError as e:
+            print(f"Не вдалося зберегти кеш схожості: {e}")
+
+    def similar(self, lesson_id, k=5):
+        import numpy as np
+        self.sync()
+        if self._matrix is None:
+            self._matrix = _TermMatrix(np, self.rows)
+        matrix = self._matrix
+        if lesson_id not in matrix.position:
+            return []
+        ids, indices, counts, row_of, alive = matrix.arrays()
+        df = np.asarray(self.df, dtype=np.float64)
+        idf = np.log((1 + len(self.rows)) / (1 + df)) + 1
+        weights = counts * idf[indices]
+        norms = np.sqrt(np.bincount(row_of, weights=weights * weights, minlength=len(ids)))
+        _, term_ids, term_counts = self.rows[lesson_id]
+        query = np.zeros(len(self.terms))
+        query[term_ids] = np.asarray(term_counts, dtype=np.float64) * idf[term_ids]
+        scores = np.bincount(row_of, weights=weights * query[indices], minlength=len(ids))
+        scores /= np.maximum(norms * np.linalg.norm(query), 1e-12)
+        scores[~alive] = -1
+        scores[matrix.position[lesson_id]] = -1
+        k = min(k, len(self.rows) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.catalog.get_lesson(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def display_similar(self, lesson_id, k=5):
+        results = self.similar(lesson_id, k)
+        if not results:
+            print("Схожих уроків не знайдено.")
+        for lesson, score in results:
+            print(f"{score:.2f} | {lesson.title} (📂 {lesson.category}, ✍️ {lesson.author}, ID: {lesson.id})")
+
+
+class _TermMatrix:
+    # Розріджена матриця частот у форматі CSR з номером рядка для кожного ненульового елемента.
+    # Нові рядки накопичуються й доклеюються до масивів одним блоком перед наступним запитом.
+    def __init__(self, np, rows):
+        self.np = np
+        self.ids = list(rows)
+        self.position = {lesson_id: i for i, lesson_id in enumerate(self.ids)}
+        self.alive = bytearray(b"\x01") * len(self.ids)
+        self.dead = 0
+        self.indices, self.counts, self.row_of = self._stack([rows[lesson_id][1:] for lesson_id in self.ids], 0)
+        self._appended = []
+
+    def _stack(self, rows, first):
+        np = self.np
+        lengths = np.fromiter((len(term_ids) for term_ids, _ in rows), dtype=np.int64, count=len(rows))
+        indices = np.fromiter(itertools.chain.from_iterable(term_ids for term_ids, _ in rows),
+                              dtype=np.int64, count=int(lengths.sum()))
+        counts = np.fromiter(itertools.chain.from_iterable(counts for _, counts in rows),
+                             dtype=np.float64, count=len(indices))
+        row_of = np.repeat(np.arange(first, first + len(rows)), lengths)
+        return indices, counts, row_of
+
+    def append(self, lesson_id, term_ids, counts):
+        self.position[lesson_id] = len(self.ids)
+        self.ids.append(lesson_id)
+        self.alive.append(1)
+        self._appended.append((term_ids, counts))
+
+    def remove(self, lesson_id):
+        row = self.position.pop(lesson_id, None)
+        if row is not None:
+            self.alive[row] = 0
+            self.dead += 1
+
+    def arrays(self):
+        if self._appended:
+            np = self.np
+            indices, counts, row_of = self._stack(self._appended, len(self.ids) - len(self._appended))
+            self.indices = np.concatenate((self.indices, indices))
+            self.counts = np.concatenate((self.counts, counts))
+            self.row_of = np.concatenate((self.row_of, row_of))
+            self._appended = []
+        alive = self.np.frombuffer(bytes(self.alive), dtype=bool)
+        return self.ids, self.indices, self.counts, self.row_of, alive
+
+
+class _Block:
+    __slots__ = ("items", "index")
+
+    def __init__(self, items):
+        self.items = items
+        self.index = 0
+
+
+class OrderStatisticList:
+    # Блоковий список: елементи лежать у блоках до 2 * LOAD штук, а дерево Фенвіка над розмірами
+    # блоків за O(log n) знаходить блок за позицією. Вставка/видалення зсувають лише один блок.
+    # Кожен елемент має атрибут block, щоб за самим елементом швидко знайти його позицію.
+    LOAD = 256
+
+    def __init__(self, items=()):
+        items = list(items)
+        self._len = len(items)
+        self._blocks = []
+        for start in range(0, len(items), self.LOAD):
+            block = _Block(items[start:start + self.LOAD])
+            for item in block.items:
+                item.block = block
+            self._blocks.append(block)
+        self._reindex()
+
+    def _reindex(self):
+        # Після додавання/видалення блоків: O(кількість блоків)
+        count = len(self._blocks)
+        tree = [0] * (count + 1)
+        for i, block in enumerate(self._blocks):
+            block.index = i
+            j = i + 1
+            tree[j] += len(block.items)
+            parent = j + (j & -j)
+            if parent <= count:
+                tree[parent] += tree[j]
+        self._tree = tree
+        self._top_bit = 1 << (count.bit_length() - 1) if count else 0
+
+    def _add(self, block_index, delta):
+        tree = self._tree
+        i = block_index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, block_index):
+        tree = self._tree
+        total = 0
+        i = block_index
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position):
+        if position < 0:
+            position += self._len
+        if not 0 <= position < self._len:
+            raise IndexError("позиція поза межами списку")
+        tree = self._tree
+        index = 0
+        bit = self._top_bit
+        while bit:
+            step = index + bit
+            if step < len(tree) and tree[step] <= position:
+                index = step
+                position -= tree[step]
+            bit >>= 1
+        return self._blocks[index], position
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from block.items
+
+    def __getitem__(self, position):
+        block, offset = self._locate(position)
+        return block.items[offset]
+
+    def index(self, item):
+        block = item.block
+        for offset, candidate in enumerate(block.items):
+            if candidate is item:
+                return self._prefix(block.index) + offset
+        raise ValueError("елемента немає у списку")
+
+    def insert(self, position, item):
+        if not self._blocks:
+            self._blocks.append(_Block([]))
+            self._reindex()
+        if position >= self._len:
+            block = self._blocks[-1]
+            block.items.append(item)
+        else:
+            block, offset = self._locate(max(position, -self._len))
+            block.items.insert(offset, item)
+        item.block = block
+        self._len += 1
+        self._add(block.index, 1)
+        if len(block.items) > 2 * self.LOAD:
+            self._split(block)
 
-        self.save_to_file()
+    def append(self, item):
+        self.insert(self._len, item)
 
-    def display_lessons(self):
-        if not self.lessons:
-            print("Каталог порожній.")
-            return
-        for lesson in self.lessons:
-            print(lesson)
+    def _split(self, block):
+        tail = _Block(block.items[self.LOAD:])
+        del block.items[self.LOAD:]
+        for item in tail.items:
+            item.block = tail
+        self._blocks.insert(block.index + 1, tail)
+        self._reindex()
 
-    def load_from_file(self):
-        if os.path.exists(self.filename):
-            try:
-                with open(self.filename, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.lessons = [VideoLesson.from_dict(item) for item in data]
-            except Exception as e:
-                print(f"Помилка завантаження файлу: {e}")
-                self.lessons = []
+    def pop(self, position=-1):
+        block, offset = self._locate(position)
+        item = block.items.pop(offset)
+        self._detach(block)
+        return item
+
+    def remove(self, item):
+        block = item.block
+        for offset, candidate in enumerate(block.items):
+            if candidate is item:
+                del block.items[offset]
+                self._detach(block)
+                return
+        raise ValueError("елемента немає у списку")
+
+    def _detach(self, block):
+        self._len -= 1
+        if block.items:
+            self._add(block.index, -1)
         else:
-            self.lessons = []
+            del self._blocks[block.index]
+            self._reindex()
+
+    def move(self, source, target):
+        item = self.pop(source)
+        self.insert(target, item)
+        return item
 
-    def save_to_file(self):
-        try:
-            with open(self.filename, "w", encoding="utf-8") as f:
-                json.dump([lesson.to_dict() for lesson in self.lessons],
-                          f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            print(f"Помилка збереження файлу: {e}")
+
+class _PlaylistEntry:
+    __slots__ = ("lesson", "block")
+
+    def __init__(self, lesson):
+        self.lesson = lesson
+        self.block = None
 
 
 class Playlist:
@@ -161,29 +2366,119 @@ class Playlist:
         self.name = name
         self.lessons = lessons if lessons is not None else []
 
+    # Входження зберігаються у блоковому списку (вставка/переміщення/видалення за O(log n)),
+    # а індекс позицій веде ID уроку -> список його входжень, тож дублікати підтримуються.
+    @property
+    def lessons(self):
+        return [entry.lesson for entry in self._entries]
+
+    @lessons.setter
+    def lessons(self, lessons):
+        entries = [_PlaylistEntry(lesson) for lesson in lessons]
+        self._entries = OrderStatisticList(entries)
+        self.stats = Aggregates(entry.lesson for entry in entries)
+        self._positions = {}
+        for entry in entries:
+            self._positions.setdefault(entry.lesson.id, []).append(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def contains(self, lesson_id):
+        return lesson_id in self._positions
+
+    def lesson_at(self, position):
+        return self._entries[position].lesson
+
+    def _first_entry(self, lesson_id):
+        occurrences = self._positions.get(lesson_id)
+        if not occurrences:
+            return None
+        if len(occurrences) == 1:
+            return occurrences[0]
+        return min(occurrences, key=self._entries.index)
+
     def find_lesson_index(self, lesson_id):
-        for index, lesson in enumerate(self.lessons):
-            if lesson.id == lesson_id:
-                return index
-        return -1
+        entry = self._first_entry(lesson_id)
+        return self._entries.index(entry) if entry is not None else -1
 
     def add_to_playlist(self, lesson):
-        self.lessons.append(lesson)
+        self.insert_lesson(len(self._entries), lesson)
+
+    def insert_lesson(self, position, lesson):
+        entry = _PlaylistEntry(lesson)
+        self._entries.insert(position, entry)
+        self.stats.add(lesson)
+        self._positions.setdefault(lesson.id, []).append(entry)
+
+    def _forget(self, entry):
+        self.stats.remove(entry.lesson)
+        occurrences = self._positions[entry.lesson.id]
+        occurrences.remove(entry)
+        if not occurrences:
+            del self._positions[entry.lesson.id]
+
+    def remove_at(self, position):
+        entry = self._entries.pop(position)
+        self._forget(entry)
+        return entry.lesson
+
+    def move_lesson(self, source, target):
+        return self._entries.move(source, target).lesson
 
     def remove_from_playlist(self, lesson_id):
-        index = self.find_lesson_index(lesson_id)
-        if index != -1:
-            del self.lessons[index]
-        else:
+        entry = self._first_entry(lesson_id)
+        if entry is None:
             print("Неправильний ID уроку в плейлисті.")
+            return False
+        self._entries.remove(entry)
+        self._forget(entry)
+        return True
+
+    def remove_all(self, lesson_id):
+        for entry in self._positions.pop(lesson_id, ()):
+            self._entries.remove(entry)
+            self.stats.remove(entry.lesson)
+
+    def substitute(self, lesson_id, lesson):
+        # Входження уроку lesson_id переводимо на інший урок (злиття дублікатів), позиції не змінюються
+        for entry in self._positions.pop(lesson_id, ()):
+            self.stats.replace(entry.lesson, lesson)
+            entry.lesson = lesson
+            self._positions.setdefault(lesson.id, []).append(entry)
+
+    def collapse_repeats(self, lesson_id=None):
+        # Залишаємо лише перше входження кожного уроку (або лише уроку lesson_id)
+        removed = 0
+        candidates = self._positions if lesson_id is None else [lesson_id]
+        for lesson_id in [lesson_id for lesson_id in candidates if len(self._positions.get(lesson_id, ())) > 1]:
+            first = self._first_entry(lesson_id)
+            for entry in list(self._positions[lesson_id]):
+                if entry is not first:
+                    self._entries.remove(entry)
+                    self._forget(entry)
+                    removed += 1
+        return removed
+
+    def repeats(self):
+        return [(entries[0].lesson, len(entries)) for entries in self._positions.values() if len(entries) > 1]
+
+    def replace_lesson(self, lesson, previous=None):
+        # Якщо в плейлисті той самий об'єкт, що й у каталозі, старі значення беремо з previous
+        for entry in self._positions.get(lesson.id, ()):
+            old = previous if entry.lesson is lesson and previous is not None else entry.lesson
+            self.stats.replace(old, lesson)
+            entry.lesson = lesson
 
     def display_playlist(self):
         print(f"Плейлист: {self.name} (ID: {self.id})")
+        if self.stats.count:
+            print(f"  Уроків: {self.stats.count}, загальна тривалість: {self.stats.total_duration} хв.")
         if not self.lessons:
             print("  В плейлисті нічого немає.")
         else:
-            for lesson in self.lessons:
-                print(lesson)
+            for position, lesson in enumerate(self.lessons, 1):
+                print(f"{position}. {lesson}")
 
     def to_dict(self):
         return {
@@ -198,69 +2493,1195 @@ class Playlist:
         return cls(data['name'], lessons=lessons, playlist_id=data.get('id'))
 
 
+# Серіалізатори генеруються зі схеми полів: об'єкт записується позиційним кортежем,
+# а відновлюється з кортежу без проміжного словника.
+LESSON_FIELDS = ("id", "title", "description", "author", "duration", "category")
+STORED_LESSON_FIELDS = ("id", "title", "author", "duration", "category")
+
+
+def generate_lesson_serializers(fields, with_description_ref=False):
+    # Атрибут description читається через property (лінивий опис), а встановлюється напряму
+    getters = [f"obj.{field}" for field in fields]
+    setters = ["obj._description" if field == "description" else f"obj.{field}" for field in fields]
+    if with_description_ref:
+        getters += ["obj.description_ref[1]", "obj.description_ref[2]"]
+        setters += ["offset", "length"]
+        ref = "(store, offset, length)"
+    else:
+        ref = "None"
+    if "description" not in fields:
+        setters_tail = "    obj._description = None\n"
+    else:
+        setters_tail = ""
+    source = (
+        "def encode(obj):\n"
+        f"    return ({', '.join(getters)})\n"
+        "\n"
+        "def decode(row, store=None):\n"
+        "    obj = new(VideoLesson)\n"
+        f"    {', '.join(setters)} = row\n"
+        f"{setters_tail}"
+        f"    obj.description_ref = {ref}\n"
+        "    return obj\n"
+    )
+    namespace = {"new": object.__new__, "VideoLesson": VideoLesson}
+    exec(compile(source, "<lesson-serializers>", "exec"), namespace)
+    return namespace["encode"], namespace["decode"]
+
+
+encode_lesson, decode_lesson = generate_lesson_serializers(LESSON_FIELDS)
+encode_stored_lesson, decode_stored_lesson = generate_lesson_serializers(STORED_LESSON_FIELDS,
+                                                                         with_description_ref=True)
+
+
+def encode_playlist(playlist, memo):
+    # Один і той самий урок у плейлистах кодуємо лише раз за збереження
+    lessons = []
+    for lesson in playlist.lessons:
+        row = memo.get(lesson)
+        if row is None:
+            row = memo[lesson] = encode_lesson(lesson)
+        lessons.append(row)
+    return playlist.id, playlist.name, lessons
+
+
+def decode_playlist(row):
+    if isinstance(row, dict):
+        return Playlist.from_dict(row)
+    playlist_id, name, lessons = row
+    return Playlist(name, lessons=[decode_lesson(item) for item in lessons], playlist_id=playlist_id)
+
+
 class PlaylistManager:
-    def __init__(self, filename="playlists.json"):
+    def __init__(self, filename="playlists.json", codec="json"):
         self.filename = filename
-        self.playlists = []
+        self.codec = codec
+        self._stamp = None
+        self._pending_upserts = {}
+        self._pending_deletes = set()
+        self.catalog = None
+        self.playlists = {}  # ID плейлиста -> плейлист
+        self.lesson_index = {}  # ID уроку -> {плейлист: кількість входжень}
         self.load_from_file()
 
-    def load_from_file(self):
-        if os.path.exists(self.filename):
-            try:
-                with open(self.filename, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.playlists = [Playlist.from_dict(item) for item in data]
-            except Exception as e:
-                print(f"Помилка завантаження файлу плейлистів: {e}")
-                self.playlists = []
+    def attach(self, catalog):
+        # Підписуємось на зміни каталогу, щоб видалення/редагування уроків доходили до плейлистів
+        self.catalog = catalog
+        catalog.listeners.append(self._on_catalog_change)
+        self._link_lessons()
+
+    def import_playlists(self, playlists):
+        for playlist in playlists:
+            self.playlists[playlist.id] = playlist
+            self._pending_upserts[playlist.id] = playlist
+        self._link_lessons()
+        self.save_to_file()
+
+    def _link_lessons(self):
+        # Копії уроків у плейлистах замінюємо на об'єкти з каталогу
+        if self.catalog is not None:
+            by_id = {lesson.id: lesson for lesson in self.catalog.lessons}
+            for playlist in self.playlists.values():
+                playlist.lessons = [by_id.get(lesson.id, lesson) for lesson in playlist.lessons]
+        self._rebuild_lesson_index()
+
+    def _rebuild_lesson_index(self):
+        self.lesson_index = {}
+        for playlist in self.playlists.values():
+            self._index_playlist(playlist)
+
+    def _index_playlist(self, playlist, delta=1):
+        for lesson in playlist.lessons:
+            self._index_lesson(lesson.id, playlist, delta)
+
+    def _index_lesson(self, lesson_id, playlist, delta=1):
+        counts = self.lesson_index.setdefault(lesson_id, {})
+        count = counts.get(playlist, 0) + delta
+        if count > 0:
+            counts[playlist] = count
+        else:
+            counts.pop(playlist, None)
+            if not counts:
+                del self.lesson_index[lesson_id]
+
+    def _on_catalog_change(self, event, lesson, previous=None):
+        if event == "load":
+            self._link_lessons()
+            return
+        if event == "delete":
+            affected = self.lesson_index.pop(lesson.id, {})
+            for playlist in affected:
+                playlist.remove_all(lesson.id)
+        elif event == "edit":
+            affected = self.lesson_index.get(lesson.id, {})
+            for playlist in affected:
+                playlist.replace_lesson(lesson, previous)
+        elif event == "delete_many":
+            affected = set()
+            for deleted in lesson:
+                for playlist in self.lesson_index.pop(deleted.id, {}):
+                    playlist.remove_all(deleted.id)
+                    affected.add(playlist)
+        elif event == "edit_many":
+            affected = set()
+            for edited, old in zip(lesson, previous):
+                for playlist in self.lesson_index.get(edited.id, {}):
+                    playlist.replace_lesson(edited, old)
+                    affected.add(playlist)
         else:
-            self.playlists = []
+            return
+        if affected:
+            for playlist in affected:
+                self._pending_upserts[playlist.id] = playlist
+            self.save_to_file()
+
+    def playlists_containing(self, lesson_id):
+        return list(self.lesson_index.get(lesson_id, ()))
+
+    def merge_lessons(self, survivor, duplicate_ids):
+        # Плейлисти з дублікатами переводимо на урок, що залишається, і прибираємо повтори лише цього
+        # уроку — решта входжень плейлиста не змінюється. Повертає кількість прибраних повторів
+        self.refresh_if_changed()
+        affected = set()
+        for lesson_id in duplicate_ids:
+            for playlist in self.lesson_index.pop(lesson_id, {}):
+                playlist.substitute(lesson_id, survivor)
+                affected.add(playlist)
+        removed = 0
+        for playlist in affected:
+            removed += playlist.collapse_repeats(survivor.id)
+            self.lesson_index.setdefault(survivor.id, {})[playlist] = 1
+            self._pending_upserts[playlist.id] = playlist
+        if affected:
+            self.save_to_file()
+        return removed
+
+    def collapse_repeats(self):
+        self.refresh_if_changed()
+        removed = 0
+        for playlist in self.playlists.values():
+            count = playlist.collapse_repeats()
+            if count:
+                removed += count
+                self._pending_upserts[playlist.id] = playlist
+        if removed:
+            self._rebuild_lesson_index()
+            self.save_to_file()
+        return removed
+
+    def refresh_if_changed(self):
+        if file_stamp(self.filename) != self._stamp:
+            self.load_from_file()
+
+    def _read_playlists(self):
+        return [decode_playlist(row) for row in read_records_cached(self.filename)]
+
+    def load_from_file(self):
+        try:
+            with file_lock(self.filename):
+                playlists = self._read_playlists()
+                self._stamp = file_stamp(self.filename)
+            merged = merge_records(playlists, self._pending_upserts, self._pending_deletes)
+            self.playlists = {playlist.id: playlist for playlist in merged}
+        except Exception as e:
+            print(f"Помилка завантаження файлу плейлистів: {e}")
+            self.playlists = {}
+        self._link_lessons()
 
     def save_to_file(self):
         try:
-            with open(self.filename, "w", encoding="utf-8") as f:
-                json.dump([playlist.to_dict() for playlist in self.playlists],
-                          f, ensure_ascii=False, indent=4)
+            with file_lock(self.filename, exclusive=True):
+                if file_stamp(self.filename) != self._stamp:
+                    merged = merge_records(self._read_playlists(), self._pending_upserts, self._pending_deletes)
+                    self.playlists = {playlist.id: playlist for playlist in merged}
+                    self._link_lessons()
+                memo = {}
+                records = [encode_playlist(playlist, memo) for playlist in self.playlists.values()]
+                write_records(self.filename, records, self.codec)
+                write_snapshot(self.filename, records)
+                self._stamp = file_stamp(self.filename)
+            self._pending_upserts.clear()
+            self._pending_deletes.clear()
         except Exception as e:
             print(f"Помилка збереження файлу плейлистів: {e}")
 
     def add_playlist(self, playlist):
-        self.playlists.append(playlist)
+        self.refresh_if_changed()
+        self.playlists[playlist.id] = playlist
+        self._index_playlist(playlist)
+        self._pending_upserts[playlist.id] = playlist
+        self.save_to_file()
+
+    def add_lesson_to_playlist(self, playlist, lesson, position=None):
+        if position is None:
+            playlist.add_to_playlist(lesson)
+        else:
+            playlist.insert_lesson(position, lesson)
+        self._index_lesson(lesson.id, playlist)
+        self.update_playlist(playlist)
+
+    def move_lesson_in_playlist(self, playlist, source, target):
+        if not (0 <= source < len(playlist) and 0 <= target < len(playlist)):
+            print("Неправильна позиція уроку в плейлисті.")
+            return False
+        playlist.move_lesson(source, target)
+        self.update_playlist(playlist)
+        return True
+
+    def remove_lesson_from_playlist(self, playlist, lesson_id):
+        if not playlist.remove_from_playlist(lesson_id):
+            return False
+        self._index_lesson(lesson_id, playlist, -1)
+        self.update_playlist(playlist)
+        return True
+
+    def update_playlist(self, playlist):
+        self._pending_upserts[playlist.id] = playlist
         self.save_to_file()
 
     def get_playlist_by_id(self, playlist_id):
-        for playlist in self.playlists:
-            if playlist.id == playlist_id:
-                return playlist
-        return None
+        self.refresh_if_changed()
+        return self.playlists.get(playlist_id)
 
     def delete_playlist_by_id(self, playlist_id):
-        for i, playlist in enumerate(self.playlists):
-            if playlist.id == playlist_id:
-                del self.playlists[i]
-                self.save_to_file()
-                return True
-        return False
+        self.refresh_if_changed()
+        playlist = self.playlists.pop(playlist_id, None)
+        if playlist is None:
+            return False
+        self._index_playlist(playlist, -1)
+        self._pending_upserts.pop(playlist_id, None)
+        self._pending_deletes.add(playlist_id)
+        self.save_to_file()
+        return True
 
     def display_playlists(self):
+        self.refresh_if_changed()
         if not self.playlists:
             print("Немає створених плейлистів.")
         else:
-            for playlist in self.playlists:
+            for playlist in self.playlists.values():
                 playlist.display_playlist()
 
 
-def main():
-    catalog = Catalog()
-    playlist_manager = PlaylistManager()
+class PlaylistBuilder:
+    # Плейлист під бюджет часу. Уроки однієї тривалості взаємозамінні для бюджету, тож рюкзак будується
+    # за різними тривалостями з обмеженою кількістю (розкладеною на двійкові пачки 1, 2, 4, ...):
+    # O(бюджет · Σ log кількості) замість O(бюджет · уроків). Серед заповнень з максимумом хвилин
+    # обирається те, де більше уроків, а конкретні уроки кожної тривалості добираються так,
+    # щоб автори повторювались якнайрідше.
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def candidates(self, budget, category=None, author=None):
+        return self.catalog.filter_lessons(category=category, author=author, min_duration=1, max_duration=budget)
+
+    @staticmethod
+    def plan(budget, counts):
+        # counts: тривалість -> кількість доступних уроків; результат: тривалість -> скільки взяти
+        bundles = []
+        for duration, count in sorted(counts.items()):
+            size = 1
+            while count > 0 and duration * min(size, count) <= budget:
+                bundles.append((duration, min(size, count)))
+                count -= size
+                size *= 2
+        best = [-1] * (budget + 1)  # найбільша кількість уроків, що дає рівно w хвилин
+        best[0] = 0
+        taken = []
+        for duration, count in bundles:
+            weight = duration * count
+            row = bytearray(budget + 1)
+            for w in range(budget, weight - 1, -1):
+                previous = best[w - weight]
+                if previous >= 0 and previous + count > best[w]:
+                    best[w] = previous + count
+                    row[w] = 1
+            taken.append(row)
+        w = max(w for w in range(budget + 1) if best[w] >= 0)
+        result = {}
+        for (duration, count), row in zip(reversed(bundles), reversed(taken)):
+            if row[w]:
+                result[duration] = result.get(duration, 0) + count
+                w -= duration * count
+        return result
+
+    def build(self, name, budget, category=None, author=None, max_per_author=None):
+        lessons = self.candidates(budget, category, author)
+        by_duration = {}
+        for lesson in lessons:
+            by_duration.setdefault(int(lesson.duration), []).append(lesson)
+        plan = self.plan(budget, {duration: len(group) for duration, group in by_duration.items()})
+        used = {}
+        chosen = set()
+        # Спершу тривалості з найменшим вибором, щоб "рідкісні" автори не були витрачені на інші
+        for duration in sorted(plan, key=lambda d: len(by_duration[d])):
+            by_author = {}
+            for lesson in reversed(by_duration[duration]):
+                by_author.setdefault(lesson.author, []).append(lesson)
+            heap = [(used.get(lesson_author, 0), order, lesson_author)
+                    for order, lesson_author in enumerate(by_author)]
+            heapq.heapify(heap)
+            need = plan[duration]
+            while need and heap:
+                count, order, lesson_author = heapq.heappop(heap)
+                if max_per_author is not None and count >= max_per_author:
+                    break
+                lesson = by_author[lesson_author].pop()
+                chosen.add(lesson.id)
+                used[lesson_author] = count + 1
+                need -= 1
+                if by_author[lesson_author]:
+                    heapq.heappush(heap, (count + 1, order, lesson_author))
+        # Обмеження на автора могло залишити недобір — дозаповнюємо жадібно найдовшими уроками, що влазять
+        total = sum(lesson.duration for lesson in lessons if lesson.id in chosen)
+        if max_per_author is not None and total < budget:
+            for lesson in sorted(lessons, key=lambda lesson: -lesson.duration):
+                if (lesson.id not in chosen and lesson.duration <= budget - total
+                        and used.get(lesson.author, 0) < max_per_author):
+                    chosen.add(lesson.id)
+                    used[lesson.author] = used.get(lesson.author, 0) + 1
+                    total += lesson.duration
+        return Playlist(name, lessons=[lesson for lesson in lessons if lesson.id in chosen])
+
+    def display_summary(self, playlist, budget):
+        lessons = playlist.lessons
+        total = sum(lesson.duration for lesson in lessons)
+        authors = {lesson.author for lesson in lessons}
+        print(f"Уроків: {len(lessons)}, тривалість: {total} з {budget} хв., авторів: {len(authors)}")
+
+
+class StudyPlanner:
+    # Розкладання плейлиста на навчальні сесії з лімітом хвилин. Якщо порядок уроків важливий —
+    # next-fit: сесії заповнюються підряд, і це дає найменшу кількість сесій серед розбиттів,
+    # що не змінюють порядок. Інакше — best-fit decreasing: найдовші уроки йдуть першими, кожен у сесію
+    # з найменшим достатнім залишком; залишки тримаються відсортованими, пошук — через bisect.
+    PERIODS = {"day": 1, "week": 7}
+
+    def __init__(self, max_minutes, period="day", keep_order=True):
+        self.max_minutes = max_minutes
+        self.period = period
+        self.keep_order = keep_order
+
+    def next_fit(self, durations):
+        sessions = []
+        minutes = None
+        for i, duration in enumerate(durations):
+            if minutes is None or minutes + duration > self.max_minutes:
+                sessions.append([])
+                minutes = 0
+            sessions[-1].append(i)
+            minutes += duration
+        return sessions
+
+    def best_fit_decreasing(self, durations):
+        sessions = []
+        remaining = []  # відсортовані (залишок хвилин, номер сесії)
+        for i in sorted(range(len(durations)), key=lambda i: -durations[i]):
+            duration = durations[i]
+            position = bisect.bisect_left(remaining, (duration, -1))
+            if position == len(remaining):
+                number, left = len(sessions), self.max_minutes
+                sessions.append([])
+            else:
+                left, number = remaining.pop(position)
+            sessions[number].append(i)
+            if left - duration > 0:
+                bisect.insort(remaining, (left - duration, number))
+        # Сесії та уроки в них ідуть у порядку плейлиста
+        for session in sessions:
+            session.sort()
+        sessions.sort()
+        return sessions
+
+    def split(self, lessons):
+        # Урок, довший за ліміт, займає окрему сесію
+        durations = [int(lesson.duration) for lesson in lessons]
+        pack = self.next_fit if self.keep_order else self.best_fit_decreasing
+        return [[lessons[i] for i in session] for session in pack(durations)]
+
+    def label(self, number, start):
+        days = self.PERIODS[self.period]
+        begin = start + datetime.timedelta(days=number * days)
+        if days == 1:
+            return f"День {number + 1} ({begin:%d.%m.%Y})"
+        end = begin + datetime.timedelta(days=days - 1)
+        return f"Тиждень {number + 1} ({begin:%d.%m.%Y} – {end:%d.%m.%Y})"
+
+    def schedule(self, playlist, start=None):
+        start = start or datetime.date.today()
+        return [(self.label(number, start), session) for number, session in enumerate(self.split(playlist.lessons))]
+
+    def display_schedule(self, playlist, start=None):
+        plan = self.schedule(playlist, start)
+        if not plan:
+            print("В плейлисті немає уроків для розкладу.")
+            return
+        print(f"Розклад плейлиста {playlist.name}: сесій {len(plan)}, ліміт {self.max_minutes} хв.")
+        for label, session in plan:
+            minutes = sum(lesson.duration for lesson in session)
+            note = " (перевищує ліміт)" if minutes > self.max_minutes else ""
+            print(f"{label}: {minutes} хв.{note}")
+            for lesson in session:
+                print(f"  - {lesson.title} ({lesson.duration} хв., ID: {lesson.id})")
+
+
+class LatencyHistogram:
+    # Межі кошиків — степені двійки від 1 мкс до ~67 с
+    BOUNDS_NS = [1000 << i for i in range(27)]
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS_NS) + 1)
+        self.count = 0
+        self.total_ns = 0
+
+    def record(self, elapsed_ns):
+        self.buckets[bisect.bisect_left(self.BOUNDS_NS, elapsed_ns)] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+
+    def quantile(self, q):
+        # Оцінка за верхньою межею кошика
+        if not self.count:
+            return 0.0
+        threshold = q * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS_NS + [self.BOUNDS_NS[-1] * 2], self.buckets):
+            seen += count
+            if seen >= threshold:
+                return bound / 1e9
+        return self.BOUNDS_NS[-1] / 1e9
+
+
+class Metrics:
+    # Вимірювання вмикається підміною методів обгортками, тож вимкнене воно не коштує нічого
+    OPERATIONS = {
+        "Catalog": {
+            "load_from_file": "load", "save_to_file": "save", "add_lesson": "add", "edit_lesson": "edit",
+            "delete_lesson": "delete", "filter_lessons": "filter", "query": "query", "apply_sort": "sort",
+            "edit_lessons": "edit_batch", "delete_lessons": "delete_batch",
+        },
+        "PlaylistManager": {
+            "load_from_file": "playlists_load", "save_to_file": "playlists_save",
+            "add_playlist": "playlist_add", "get_playlist_by_id": "playlist_get",
+            "delete_playlist_by_id": "playlist_delete", "add_lesson_to_playlist": "playlist_add_lesson",
+            "remove_lesson_from_playlist": "playlist_remove_lesson", "move_lesson_in_playlist": "playlist_move_lesson",
+        },
+    }
+
+    def __init__(self):
+        self.enabled = False
+        self._originals = []
+        self.reset()
+
+    def reset(self):
+        self.histograms = {}
+        self.bytes_read = {}
+        self.bytes_written = {}
 
-    # Тестове додавання уроків, якщо файл порожній
-    if not catalog.lessons:
-        catalog.add_lesson(VideoLesson("Python Basics", "Вступ до Python", "Ярослав", 45, "Програмування"))
-        catalog.add_lesson(VideoLesson("OOP in Python", "Класи та об'єкти", "Олег", 60, "Програмування"))
-        catalog.add_lesson(VideoLesson("Advanced Python", "Глибоке занурення", "Юля", 90, "Програмування"))
+    def _histogram(self, operation):
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            histogram = self.histograms[operation] = LatencyHistogram()
+        return histogram
+
+    def _count_bytes(self, counters, filename, size):
+        kind = os.path.basename(filename)
+        counters[kind] = counters.get(kind, 0) + size
+
+    def _timed(self, operation, function):
+        histogram = self._histogram(operation)
+        clock = time.perf_counter_ns
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.record(clock() - start)
+        return wrapper
+
+    def _patch(self, owner, name, replacement):
+        self._originals.append((owner, name, owner.__dict__[name] if isinstance(owner, type) else owner[name]))
+        if isinstance(owner, type):
+            setattr(owner, name, replacement)
+        else:
+            owner[name] = replacement
+
+    def enable(self):
+        if self.enabled:
+            return
+        module = globals()
+        for class_name, methods in self.OPERATIONS.items():
+            owner = module[class_name]
+            for method, operation in methods.items():
+                self._patch(owner, method, self._timed(operation, owner.__dict__[method]))
+
+        read_records_original = module["read_records"]
+        write_records_original = module["write_records"]
+
+        def read_records_measured(filename):
+            if os.path.exists(filename):
+                self._count_bytes(self.bytes_read, filename, os.path.getsize(filename))
+            return read_records_original(filename)
+
+        def write_records_measured(filename, records, codec="json"):
+            write_records_original(filename, records, codec)
+            self._count_bytes(self.bytes_written, filename, os.path.getsize(filename))
+
+        # Знімки читаються й пишуться повністю, а перевірка знімка хешує весь файл-джерело
+        def read_snapshot_measured(filename):
+            snapshot = snapshot_filename(filename)
+            if os.path.exists(snapshot):
+                self._count_bytes(self.bytes_read, snapshot, os.path.getsize(snapshot))
+            return read_snapshot_original(filename)
+
+        def write_snapshot_measured(filename, records, key=None):
+            write_snapshot_original(filename, records, key)
+            snapshot = snapshot_filename(filename)
+            if os.path.exists(snapshot):
+                self._count_bytes(self.bytes_written, snapshot, os.path.getsize(snapshot))
+
+        def file_digest_measured(filename):
+            digest = file_digest_original(filename)
+            self._count_bytes(self.bytes_read, filename, os.path.getsize(filename))
+            return digest
+
+        def read_description(store, offset, length):
+            self._count_bytes(self.bytes_read, store.filename, length)
+            return read_description_original(store, offset, length)
+
+        def append_descriptions(store, texts):
+            refs = append_descriptions_original(store, texts)
+            self._count_bytes(self.bytes_written, store.filename, sum(ref[2] for ref in refs))
+            return refs
+
+        read_snapshot_original = module["read_snapshot"]
+        write_snapshot_original = module["write_snapshot"]
+        file_digest_original = module["file_digest"]
+        read_description_original = DescriptionStore.__dict__["_read_from_file"]
+        append_descriptions_original = DescriptionStore.__dict__["append_many"]
+        self._patch(module, "read_records", read_records_measured)
+        self._patch(module, "write_records", write_records_measured)
+        self._patch(module, "read_snapshot", read_snapshot_measured)
+        self._patch(module, "write_snapshot", write_snapshot_measured)
+        self._patch(module, "file_digest", file_digest_measured)
+        self._patch(DescriptionStore, "_read_from_file", read_description)
+        self._patch(DescriptionStore, "append_many", append_descriptions)
+        self.enabled = True
+
+    def disable(self):
+        for owner, name, original in reversed(self._originals):
+            if isinstance(owner, type):
+                setattr(owner, name, original)
+            else:
+                owner[name] = original
+        self._originals = []
+        self.enabled = False
+
+    def snapshot(self):
+        return {
+            "operations": {
+                operation: {
+                    "count": histogram.count,
+                    "total_seconds": histogram.total_ns / 1e9,
+                    "mean_seconds": histogram.total_ns / histogram.count / 1e9 if histogram.count else 0.0,
+                    "p50_seconds": histogram.quantile(0.5),
+                    "p99_seconds": histogram.quantile(0.99),
+                    "buckets": {f"{bound / 1e9:g}": count
+                                for bound, count in zip(histogram.BOUNDS_NS, histogram.buckets) if count},
+                }
+                for operation, histogram in sorted(self.histograms.items()) if histogram.count
+            },
+            "bytes_read": dict(self.bytes_read),
+            "bytes_written": dict(self.bytes_written),
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=4)
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP catalog_operation_duration_seconds Тривалість операцій каталогу",
+            "# TYPE catalog_operation_duration_seconds histogram",
+        ]
+        for operation, histogram in sorted(self.histograms.items()):
+            if not histogram.count:
+                continue
+            cumulative = 0
+            for bound, count in zip(histogram.BOUNDS_NS, histogram.buckets):
+                cumulative += count
+                lines.append(f'catalog_operation_duration_seconds_bucket{{operation="{operation}",'
+                             f'le="{bound / 1e9:g}"}} {cumulative}')
+            lines.append(f'catalog_operation_duration_seconds_bucket{{operation="{operation}",le="+Inf"}} '
+                         f'{histogram.count}')
+            lines.append(f'catalog_operation_duration_seconds_sum{{operation="{operation}"}} '
+                         f'{histogram.total_ns / 1e9:.9f}')
+            lines.append(f'catalog_operation_duration_seconds_count{{operation="{operation}"}} {histogram.count}')
+        for name, counters in (("catalog_bytes_read_total", self.bytes_read),
+                               ("catalog_bytes_written_total", self.bytes_written)):
+            lines.append(f"# TYPE {name} counter")
+            for kind, value in sorted(counters.items()):
+                lines.append(f'{name}{{file="{kind}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, filename):
+        text = self.to_prometheus() if filename.endswith((".prom", ".txt")) else self.to_json()
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+METRICS = Metrics()
+
+
+class Profiler:
+    # Профілювання окремих команд: для кожної — .pstats, текстовий звіт і (за бажанням) топ алокацій
+    def __init__(self):
+        self.directory = None
+        self.trace_memory = False
+        self._sequence = 0
+        self._current = None
+
+    def enable(self, directory, trace_memory=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.trace_memory = trace_memory
+
+    def start(self, name):
+        if self.directory is None:
+            return
+        self.stop()
+        import cProfile
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start(10)
+        profile = cProfile.Profile()
+        self._current = (name, profile)
+        profile.enable()
+
+    def stop(self):
+        if self._current is None:
+            return
+        import pstats
+        import tracemalloc
+        name, profile = self._current
+        profile.disable()
+        self._current = None
+        self._sequence += 1
+        safe_name = re.sub(r"[^\w.-]+", "_", name)
+        prefix = os.path.join(self.directory, f"{self._sequence:03d}-{safe_name}")
+        profile.dump_stats(prefix + ".pstats")
+        with open(prefix + ".txt", "w", encoding="utf-8") as f:
+            stats = pstats.Stats(profile, stream=f)
+            stats.sort_stats("cumulative").print_stats(40)
+            stats.sort_stats("tottime").print_stats(20)
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(prefix + "-alloc.txt", "w", encoding="utf-8") as f:
+                f.write(f"Поточна пам'ять: {current / 1024:.1f} КБ, пік: {peak / 1024:.1f} КБ\n\n")
+                for statistic in snapshot.statistics("lineno")[:25]:
+                    f.write(f"{statistic}\n")
+
+    @contextmanager
+    def command(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+
+PROFILER = Profiler()
+
+
+def make_sample_records(count):
+    authors = ["Ярослав", "Олег", "Юля", "Марія", "Ігор", "Євген"]
+    categories = ["Програмування", "Тестування", "Дизайн", "Бази даних"]
+    return [
+        {
+            'id': str(uuid.UUID(int=i)),
+            'title': f"Урок {i}: основи Python",
+            'author': authors[i % len(authors)],
+            'duration': 5 + i % 120,
+            'category': categories[i % len(categories)],
+            'description_ref': [i * 64, 64]
+        }
+        for i in range(count)
+    ]
+
+
+def benchmark_codecs(sizes):
+    for count in sizes or (10_000, 100_000, 1_000_000):
+        records = make_sample_records(count)
+        print(f"--- {count} уроків ---")
+        print(f"{'Кодек':<14}{'Запис, зап/с':>16}{'Читання, зап/с':>18}{'Розмір, КБ':>14}")
+        for name, codec in CODECS.items():
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            codec.encode(records, buffer)
+            encode_time = time.perf_counter() - start
+            buffer.seek(0)
+            start = time.perf_counter()
+            codec.decode(buffer)
+            decode_time = time.perf_counter() - start
+            print(f"{name:<14}{count / encode_time:>16,.0f}{count / decode_time:>18,.0f}"
+                  f"{buffer.getbuffer().nbytes / 1024:>14,.0f}")
+
+
+def benchmark_serializers(sizes):
+    for count in sizes or (100_000,):
+        lessons = [VideoLesson.from_dict(dict(record, description="Опис уроку " * 4))
+                   for record in make_sample_records(count)]
+        print(f"--- {count} уроків, зап/с ---")
+        print(f"{'Операція':<26}{'to_dict/from_dict':>20}{'генеровані':>14}")
+        timings = []
+        for encode, decode in ((VideoLesson.to_dict, VideoLesson.from_dict), (encode_lesson, decode_lesson)):
+            start = time.perf_counter()
+            rows = [encode(lesson) for lesson in lessons]
+            encode_time = time.perf_counter() - start
+            start = time.perf_counter()
+            [decode(row) for row in rows]
+            decode_time = time.perf_counter() - start
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            CODECS["binary"].encode(map(encode, lessons), buffer)
+            buffer.seek(0)
+            [decode(row) for row in CODECS["binary"].decode(buffer)]
+            roundtrip_time = time.perf_counter() - start
+            timings.append((encode_time, decode_time, roundtrip_time))
+        for i, operation in enumerate(("кодування", "декодування", "повний цикл через binary")):
+            print(f"{operation:<26}{count / timings[0][i]:>20,.0f}{count / timings[1][i]:>14,.0f}")
+
+
+def benchmark_compression(sizes):
+    directory = tempfile.mkdtemp(prefix="compression-bench-")
+    try:
+        for count in sizes or (100_000,):
+            rows = [(record['id'], record['title'], "Опис уроку: " + record['title'] * 3, record['author'],
+                     record['duration'], record['category']) for record in make_sample_records(count)]
+            print(f"--- {count} уроків ---")
+            print(f"{'Кодек':<14}{'Стиснення':<11}{'Розмір, КБ':>12}{'Запис, с':>10}{'Читання, с':>12}")
+            for codec in CODECS:
+                for extension in ("", ".gz", ".bz2", ".xz"):
+                    filename = os.path.join(directory, f"catalog.{codec}{extension}")
+                    start = time.perf_counter()
+                    write_records(filename, rows, codec)
+                    write_time = time.perf_counter() - start
+                    start = time.perf_counter()
+                    read_records(filename)
+                    read_time = time.perf_counter() - start
+                    compression = compression_by_extension(filename) or "—"
+                    print(f"{codec:<14}{compression:<11}{os.path.getsize(filename) / 1024:>12,.0f}"
+                          f"{write_time:>10.3f}{read_time:>12.3f}")
+                    os.remove(filename)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def sample_lessons(count):
+    return [VideoLesson.from_dict(dict(record, description="Опис уроку")) for record in make_sample_records(count)]
+
+
+def benchmark_playlists(sizes):
+    rng = random.Random(42)
+    for count in sizes or (1_000, 10_000, 100_000):
+        lessons = sample_lessons(count)
+        playlists = [Playlist(f"Плейлист {i}", playlist_id=str(uuid.UUID(int=i))) for i in range(count)]
+        by_id = {playlist.id: playlist for playlist in playlists}
+        targets = [playlist.id for playlist in rng.sample(playlists, min(count, 200))]
+        start = time.perf_counter()
+        for playlist_id in targets:
+            next(playlist for playlist in playlists if playlist.id == playlist_id)
+        scan_time = (time.perf_counter() - start) / len(targets)
+        start = time.perf_counter()
+        for playlist_id in targets:
+            by_id.get(playlist_id)
+        dict_time = (time.perf_counter() - start) / len(targets)
+
+        # Видалення уроків зі списку та з плейлиста з індексом позицій
+        removed = [lesson.id for lesson in rng.sample(lessons, min(count, 200))]
+        as_list = list(lessons)
+        start = time.perf_counter()
+        for lesson_id in removed:
+            index = next(i for i, lesson in enumerate(as_list) if lesson.id == lesson_id)
+            del as_list[index]
+        list_remove_time = (time.perf_counter() - start) / len(removed)
+        playlist = Playlist("Великий", lessons=lessons)
+        start = time.perf_counter()
+        for lesson_id in removed:
+            playlist.remove_from_playlist(lesson_id)
+        indexed_remove_time = (time.perf_counter() - start) / len(removed)
+
+        print(f"--- {count} плейлистів / уроків у плейлисті, мкс на операцію ---")
+        print(f"{'Операція':<30}{'список':>12}{'індекс':>12}")
+        print(f"{'пошук плейлиста за ID':<30}{scan_time * 1e6:>12.2f}{dict_time * 1e6:>12.2f}")
+        print(f"{'видалення уроку з плейлиста':<30}{list_remove_time * 1e6:>12.2f}{indexed_remove_time * 1e6:>12.2f}")
+
+
+def benchmark_reorder(sizes):
+    rng = random.Random(42)
+    operations = 2_000
+    for count in sizes or (10_000, 100_000, 1_000_000):
+        plan = [(rng.random(), rng.randrange(count), rng.randrange(count)) for _ in range(operations)]
+        results = []
+        for structure in (list, OrderStatisticList):
+            items = structure(_PlaylistEntry(None) for _ in range(count))
+            start = time.perf_counter()
+            for kind, source, target in plan:
+                source %= len(items)
+                if kind < 0.4:
+                    items.insert(source, _PlaylistEntry(None))
+                elif kind < 0.7:
+                    items.pop(source)
+                else:
+                    items.insert(target % len(items), items.pop(source))
+            results.append((time.perf_counter() - start) / operations)
+        print(f"{count:>10} уроків: список {results[0] * 1e6:>9.2f} мкс/оп, "
+              f"блоковий список {results[1] * 1e6:>7.2f} мкс/оп")
+
+
+def benchmark_shards(sizes):
+    # Запит до однієї категорії та редагування одного уроку: весь каталог проти шардів за категоріями
+    directory = tempfile.mkdtemp(prefix="shards-bench-")
+    try:
+        for count in sizes or (100_000,):
+            lessons = [VideoLesson(record['title'], "Опис уроку " * 4, record['author'], record['duration'],
+                                   f"Категорія {i % 20}", lesson_id=record['id'])
+                       for i, record in enumerate(make_sample_records(count))]
+            catalog_file = os.path.join(directory, f"catalog-{count}.json")
+            shards_dir = os.path.join(directory, f"shards-{count}")
+            catalog = Catalog(catalog_file)
+            catalog.lessons = lessons
+            catalog.save_to_file()
+            ShardedCatalog(shards_dir).import_lessons(lessons)
+            print(f"--- {count} уроків у 20 категоріях, с ---")
+            print(f"{'Операція':<34}{'один файл':>12}{'шарди':>10}")
+            timings = []
+            for factory, path in ((Catalog, catalog_file), (ShardedCatalog, shards_dir)):
+                for filename in (catalog_file, *[os.path.join(shards_dir, name) for name in os.listdir(shards_dir)]):
+                    if os.path.exists(snapshot_filename(filename)):
+                        os.remove(snapshot_filename(filename))
+                start = time.perf_counter()
+                catalog = factory(path)
+                lesson = catalog.filter_lessons(category="Категорія 7")[0]
+                query_time = time.perf_counter() - start
+                start = time.perf_counter()
+                catalog.edit_lesson(lesson.id, title="Змінений урок")
+                timings.append((query_time, time.perf_counter() - start))
+            for i, operation in enumerate(("завантаження + запит за категорією", "редагування уроку")):
+                print(f"{operation:<34}{timings[0][i]:>12.3f}{timings[1][i]:>10.3f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchmark_parallel(sizes):
+    # Повне завантаження шардованого каталогу (без знімків) при різній кількості процесів
+    directory = tempfile.mkdtemp(prefix="parallel-bench-")
+    try:
+        for count in sizes or (200_000,):
+            shards_dir = os.path.join(directory, f"shards-{count}")
+            ShardedCatalog(shards_dir).import_lessons(
+                VideoLesson(record['title'], "Опис уроку " * 4, record['author'], record['duration'],
+                            f"Категорія {i % 16}", lesson_id=record['id'])
+                for i, record in enumerate(make_sample_records(count)))
+            print(f"--- {count} уроків у 16 шардах ---")
+            baseline = None
+            for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+                for name in os.listdir(shards_dir):
+                    if name.endswith(".snapshot"):
+                        os.remove(os.path.join(shards_dir, name))
+                start = time.perf_counter()
+                ShardedCatalog(shards_dir, workers=workers).ensure_loaded()
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(f"{workers:>3} процес(ів): {elapsed:.3f} с, прискорення x{baseline / elapsed:.2f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchmark_scan(sizes):
+    # Підрядок в описі не покривається індексами: послідовний перегляд проти колонок у спільній пам'яті
+    words = ["цикли", "рекурсія", "класи", "генератори", "декоратори"]
+    node = normalize_condition(Query.parse('description ~ "рекурсія" and duration > 30').where)
+    directory = tempfile.mkdtemp(prefix="scan-bench-")
+    try:
+        for count in sizes or (100_000, 1_000_000):
+            catalog = Catalog(os.path.join(directory, f"catalog-{count}.json"))
+            catalog.lessons = [VideoLesson(record['title'], f"Урок про {words[i % len(words)]} і {words[i % 3]}",
+                                           record['author'], record['duration'], record['category'],
+                                           lesson_id=record['id'])
+                               for i, record in enumerate(make_sample_records(count))]
+            print(f"--- {count} уроків ---")
+            baseline = None
+            for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+                catalog.scanner = ParallelScanner(workers, min_rows=0)
+                start = time.perf_counter()
+                found = catalog.scanner.scan(catalog, node)
+                first_time = time.perf_counter() - start
+                start = time.perf_counter()
+                catalog.scanner.scan(catalog, node)
+                elapsed = time.perf_counter() - start
+                catalog.scanner.close()
+                baseline = baseline or elapsed
+                print(f"{workers:>3} процес(ів): {elapsed:.3f} с (перший запуск з побудовою колонок "
+                      f"{first_time:.3f} с), прискорення x{baseline / elapsed:.2f}, знайдено {len(found)}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchmark_batch(sizes):
+    # Зміна категорії всіх уроків автора та їх видалення: по одному ID (кожен виклик — запис файлу)
+    # проти пакетних edit_lessons/delete_lessons. Поштучний варіант міряється на 20 уроках і масштабується
+    directory = tempfile.mkdtemp(prefix="batch-bench-")
+    try:
+        for count in sizes or (10_000, 100_000):
+            filename = os.path.join(directory, f"catalog-{count}.json")
+            catalog = Catalog(filename)
+            catalog.lessons = sample_lessons(count)
+            catalog._rebuild_indexes()
+            catalog._order_changed = True
+            catalog.save_to_file()
+            selected = [lesson.id for lesson in catalog.filter_lessons(author="Олег")]
+            sample = selected[:20]
+            print(f"--- {count} уроків, змінюється {len(selected)}, с ---")
+            print(f"{'Операція':<20}{'по одному (оцінка)':>20}{'пакетом':>10}")
+            timings = []
+            start = time.perf_counter()
+            for lesson_id in sample:
+                catalog.edit_lesson(lesson_id, category="Архів")
+            timings.append((time.perf_counter() - start) / len(sample) * len(selected))
+            start = time.perf_counter()
+            catalog.edit_lessons(where='author = "Олег"', category="Архів")
+            timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            for lesson_id in sample:
+                catalog.delete_lesson(lesson_id)
+            timings.append((time.perf_counter() - start) / len(sample) * len(selected))
+            start = time.perf_counter()
+            catalog.delete_lessons(selected)
+            timings.append(time.perf_counter() - start)
+            print(f"{'зміна категорії':<20}{timings[0]:>20.2f}{timings[1]:>10.3f}")
+            print(f"{'видалення':<20}{timings[2]:>20.2f}{timings[3]:>10.3f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchmark_builder(sizes):
+    # Генерація плейлиста під бюджет: вибірка кандидатів за категорією (з індексу) + рюкзак за тривалостями
+    directory = tempfile.mkdtemp(prefix="builder-bench-")
+    try:
+        for count in sizes or (10_000, 100_000):
+            catalog = Catalog(os.path.join(directory, f"catalog-{count}.json"))
+            catalog.lessons = sample_lessons(count)
+            catalog._rebuild_indexes()
+            builder = PlaylistBuilder(catalog)
+            print(f"--- {count} уроків ---")
+            for budget, category, limit in ((90, "Програмування", None), (600, None, None), (600, None, 3)):
+                start = time.perf_counter()
+                playlist = builder.build("Бенчмарк", budget, category, max_per_author=limit)
+                elapsed = time.perf_counter() - start
+                total = sum(lesson.duration for lesson in playlist.lessons)
+                print(f"бюджет {budget:>4} хв., категорія {category or 'усі':<14}, на автора {limit or '—':>2}: "
+                      f"{elapsed * 1e3:>8.1f} мс, уроків {len(playlist.lessons)}, заповнено {total} хв.")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchmark_sessions(sizes):
+    # Розклад плейлиста на сесії по 150 хв. (довше за будь-який урок);
+    # кількість сесій порівнюється з нижньою межею сума / ліміт
+    for count in sizes or (1_000, 10_000, 100_000):
+        playlist = Playlist("Бенчмарк", lessons=sample_lessons(count))
+        bound = -(-sum(lesson.duration for lesson in playlist.lessons) // 150)
+        print(f"--- {count} уроків, нижня межа {bound} сесій ---")
+        for keep_order, method in ((True, "next-fit (порядок)"), (False, "best-fit decreasing")):
+            start = time.perf_counter()
+            sessions = StudyPlanner(150, keep_order=keep_order).schedule(playlist, datetime.date(2024, 1, 1))
+            elapsed = time.perf_counter() - start
+            print(f"{method:<22}{elapsed * 1e3:>9.1f} мс, сесій {len(sessions)}")
+
+
+def benchmark_collation(sizes):
+    # Сортування за назвою: natsorted проти ключів колації (перше сортування обчислює ключі, далі — з кешу)
+    try:
+        from natsort import natsort_keygen
+    except ImportError:
+        natsort_keygen = None
+        print("Бібліотека natsort не встановлена — порівняння з natsorted пропущено.")
+    rng = random.Random(42)
+    words = ["їжак", "ґанок", "єнот", "ірис", "гора", "Іван", "Яблуко", "абетка", "урок", "Python"]
+    for count in sizes or (10_000, 100_000):
+        lessons = [VideoLesson(f"{rng.choice(words)} {rng.randrange(1000)} {rng.choice(words)}", "", "Автор", 5,
+                               "Категорія") for _ in range(count)]
+        print(f"--- {count} уроків, с ---")
+        if natsort_keygen is not None:
+            key = natsort_keygen()
+            start = time.perf_counter()
+            expected = sorted(lessons, key=lambda lesson: key(lesson.title))
+            print(f"{'natsorted':<28}{time.perf_counter() - start:>8.3f}")
+        by_key = order_key("title")
+        for label in ("ключі колації (обчислення)", "ключі колації (з кешу)"):
+            start = time.perf_counter()
+            result = sorted(lessons, key=by_key)
+            print(f"{label:<28}{time.perf_counter() - start:>8.3f}")
+        if natsort_keygen is not None:
+            moved = sum(a is not b for a, b in zip(expected, result))
+            print(f"позицій, де порядок natsorted відрізняється від українського: {moved}")
+
+
+STARTUP_SCRIPT = (
+    "import importlib.util, sys\n"
+    "spec = importlib.util.spec_from_file_location('app', sys.argv[1])\n"
+    "app = importlib.util.module_from_spec(spec)\n"
+    "spec.loader.exec_module(app)\n"
+    "app.PlaylistManager(sys.argv[3]).attach(app.Catalog(sys.argv[2]))\n"
+)
+
+
+def benchmark_startup(sizes):
+    # Запуск у новому процесі: імпорт модуля + завантаження каталогу й плейлистів.
+    # Холодний запуск — без знімків (розбір файлів), теплий — зі знімками
+    import subprocess
+    directory = tempfile.mkdtemp(prefix="startup-bench-")
+    try:
+        for count in sizes or (10_000, 100_000):
+            catalog_file = os.path.join(directory, f"catalog-{count}.json")
+            playlists_file = os.path.join(directory, f"playlists-{count}.json")
+            catalog = Catalog(catalog_file)
+            catalog.lessons = [VideoLesson(record['title'], "Опис уроку " * 4, record['author'], record['duration'],
+                                           record['category'], lesson_id=record['id'])
+                               for record in make_sample_records(count)]
+            catalog.save_to_file()
+            manager = PlaylistManager(playlists_file)
+            for i in range(max(1, count // 100)):
+                playlist = Playlist(f"Плейлист {i}", lessons=catalog.lessons[i * 10:i * 10 + 50])
+                manager.playlists[playlist.id] = playlist
+            manager.save_to_file()
+            command = [sys.executable, "-c", STARTUP_SCRIPT, os.path.abspath(__file__), catalog_file, playlists_file]
+            timings = {}
+            for mode in ("cold", "warm"):
+                runs = []
+                for _ in range(5):
+                    if mode == "cold":
+                        for filename in (catalog_file, playlists_file):
+                            if os.path.exists(snapshot_filename(filename)):
+                                os.remove(snapshot_filename(filename))
+                    start = time.perf_counter()
+                    subprocess.run(command, check=True)
+                    runs.append(time.perf_counter() - start)
+                timings[mode] = min(runs)
+            print(f"{count:>10} уроків: холодний запуск {timings['cold']:.3f} с, теплий {timings['warm']:.3f} с "
+                  f"(x{timings['cold'] / timings['warm']:.1f})")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "batch": benchmark_batch,
+    "builder": benchmark_builder,
+    "collation": benchmark_collation,
+    "compression": benchmark_compression,
+    "codecs": benchmark_codecs,
+    "parallel": benchmark_parallel,
+    "playlists": benchmark_playlists,
+    "reorder": benchmark_reorder,
+    "scan": benchmark_scan,
+    "serializers": benchmark_serializers,
+    "sessions": benchmark_sessions,
+    "shards": benchmark_shards,
+    "startup": benchmark_startup,
+}
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Програма для ведення каталогу відеоуроків")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="збирати метрики операцій і записати їх при виході (.prom — формат Prometheus, інакше JSON)")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="профілювати кожну дію меню чи команду через cProfile і зберігати звіти в DIR")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="разом з --profile записувати топ алокацій пам'яті (tracemalloc)")
+    parser.add_argument("--shards", metavar="DIR",
+                        help="зберігати каталог у шардах за категоріями в DIR (наявний каталог буде перенесено)")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="кількість процесів для повних переглядів і (з --shards) паралельного розбору шардів")
+    parser.add_argument("--codec", choices=list(CODECS), default="json",
+                        help="формат запису каталогу й плейлистів (файли в інших форматах читаються як і раніше)")
+    parser.add_argument("--catalog", metavar="FILE", default="catalog.json",
+                        help="файл каталогу; .gz, .bz2 чи .xz у кінці назви вмикає стиснення")
+    parser.add_argument("--playlists", metavar="FILE", default="playlists.json",
+                        help="файл плейлистів; .gz, .bz2 чи .xz у кінці назви вмикає стиснення")
+    subparsers = parser.add_subparsers(dest="command")
+    bench = subparsers.add_parser("bench", help="запустити бенчмарк")
+    bench.add_argument("name", choices=sorted(BENCHMARKS))
+    bench.add_argument("sizes", nargs="*", type=int, help="кількість уроків")
+    dedup = subparsers.add_parser("dedup", help="звіт про дублікати уроків і (з --merge) їх злиття")
+    dedup.add_argument("--merge", action="store_true", help="видалити дублікати й перевести на залишені уроки плейлисти")
+    dedup.add_argument("--near", action="store_true", help="зливати також схожі (не лише точні) дублікати")
+    dedup.add_argument("--threshold", type=float, default=0.7, help="поріг схожості MinHash для схожих уроків")
+    return parser.parse_args(argv)
+
+
+def parse_lesson_selection(text):
+    # Один або кілька ID через кому/пробіл — це список ID, усе інше — умова запиту
+    parts = [part for part in re.split(r"[,\s]+", text.strip()) if part]
+    try:
+        return [str(uuid.UUID(part)) for part in parts], None
+    except ValueError:
+        return None, text
+
+
+def open_catalog(shards=None, workers=None, codec="json", catalog_file="catalog.json",
+                 playlists_file="playlists.json"):
+    if shards:
+        catalog = ShardedCatalog(shards, codec, workers=workers)
+        if catalog.is_empty() and os.path.exists(catalog_file):
+            catalog.import_lessons(Catalog(catalog_file).lessons)
+    else:
+        # Новий файл (наприклад, catalog.json.gz) заповнюємо даними зі звичайного catalog.json
+        migrate = not os.path.exists(catalog_file) and os.path.exists("catalog.json")
+        catalog = Catalog(catalog_file, codec)
+        if migrate:
+            catalog.import_lessons(Catalog().lessons)
+    if workers:
+        catalog.scanner.workers = workers
+    migrate = not os.path.exists(playlists_file) and os.path.exists("playlists.json")
+    playlist_manager = PlaylistManager(playlists_file, codec)
+    if migrate:
+        playlist_manager.import_playlists(PlaylistManager().playlists.values())
+    playlist_manager.attach(catalog)
+    return catalog, playlist_manager
+
+
+def deduplicate(args):
+    catalog, playlist_manager = open_catalog(args.shards, args.workers, args.codec, args.catalog, args.playlists)
+    deduplicator = Deduplicator(catalog, threshold=args.threshold)
+    deduplicator.display_report(playlist_manager)
+    if args.merge:
+        removed, repeats = deduplicator.merge(playlist_manager, near=args.near)
+        print(f"Видалено дублікатів: {removed}, прибрано повторів у плейлистах: {repeats}")
+
+
+def main(shards=None, workers=None, codec="json", catalog_file="catalog.json", playlists_file="playlists.json"):
+    # Завантаження каталогу й плейлистів профілюється як окрема команда
+    with PROFILER.command("startup"):
+        catalog, playlist_manager = open_catalog(shards, workers, codec, catalog_file, playlists_file)
+        analytics = CatalogAnalytics(catalog)
+        deduplicator = Deduplicator(catalog)
+        similarity = SimilarityIndex(catalog)
+        builder = PlaylistBuilder(catalog)
+
+        # Тестове додавання уроків, якщо файл порожній
+        if catalog.is_empty():
+            catalog.add_lesson(VideoLesson("Python Basics", "Вступ до Python", "Ярослав", 45, "Програмування"))
+            catalog.add_lesson(VideoLesson("OOP in Python", "Класи та об'єкти", "Олег", 60, "Програмування"))
+            catalog.add_lesson(VideoLesson("Advanced Python", "Глибоке занурення", "Юля", 90, "Програмування"))
 
     while True:
+        PROFILER.stop()
         print("--- Головне меню ---")
         print("1. Показати каталог уроків")
         print("2. Додати новий урок")
@@ -269,8 +3690,12 @@ def main():
         print("5. Фільтрувати уроки")
         print("6. Сортувати уроки")
         print("7. Робота з плейлистами")
-        print("8. Вийти")
+        print("8. Статистика та аналітика")
+        print("9. Вийти")
         choice = input("Введіть номер вибраної дії: ")
+        # Дії підменю профілюються кожна окремо, а не всім сеансом разом з очікуванням вводу
+        if choice not in ('7', '8'):
+            PROFILER.start(f"menu-{choice}")
 
         if choice == '1':
             catalog.display_lessons()
@@ -287,12 +3712,24 @@ def main():
             catalog.add_lesson(VideoLesson(title, description, author, duration, category))
 
         elif choice == '3':
-            lesson_id = input("Введіть ID уроку для редагування: ")
-            try:
-                uuid.UUID(lesson_id)
-            except ValueError:
+            ids, where = parse_lesson_selection(input(
+                "Введіть ID уроку для редагування (кілька — через кому, або умову, напр. author = \"Олег\"): "))
+            if not ids and not where:
                 print("Неправильний формат ID уроку. Спробуйте ще раз.")
                 continue
+            if where:
+                # Як і при видаленні: спершу показуємо, скільки уроків підпадає під умову
+                try:
+                    selected = catalog.select_lessons(where=where)
+                except ValueError as e:
+                    print(f"Помилка у запиті: {e}")
+                    continue
+                if not selected:
+                    print("За заданими критеріями уроки не знайдені.")
+                    continue
+                if input(f"Змінити уроків: {len(selected)}? (так/ні): ").strip().lower() not in ("так", "т"):
+                    continue
+                ids = [lesson.id for lesson in selected]
             title = input("Нова назва (залиште порожнім, якщо не змінюється): ")
             description = input("Новий опис (залиште порожнім, якщо не змінюється): ")
             author = input("Новий автор (залиште порожнім, якщо не змінюється): ")
@@ -304,32 +3741,52 @@ def main():
                     duration = int(duration_input)
                 except ValueError:
                     duration = None
-            catalog.edit_lesson(
-                lesson_id,
+            changes = dict(
                 title=title if title.strip() != "" else None,
                 description=description if description.strip() != "" else None,
                 author=author if author.strip() != "" else None,
                 duration=duration,
                 category=category if category.strip() != "" else None
             )
+            if len(ids) == 1 and not where:
+                catalog.edit_lesson(ids[0], **changes)
+            else:
+                print(f"Змінено уроків: {catalog.edit_lessons(ids, **changes)}")
 
         elif choice == '4':
-            lesson_id = input("Введіть ID уроку для видалення: ")
-            try:
-                uuid.UUID(lesson_id)
-            except ValueError:
+            ids, where = parse_lesson_selection(input(
+                "Введіть ID уроку для видалення (кілька — через кому, або умову, напр. author = \"Олег\"): "))
+            if ids and len(ids) == 1:
+                catalog.delete_lesson(ids[0])
+            elif ids:
+                print(f"Видалено уроків: {catalog.delete_lessons(ids)}")
+            elif where:
+                try:
+                    selected = catalog.select_lessons(where=where)
+                except ValueError as e:
+                    print(f"Помилка у запиті: {e}")
+                    continue
+                if not selected:
+                    print("За заданими критеріями уроки не знайдені.")
+                elif input(f"Видалити уроків: {len(selected)}? (так/ні): ").strip().lower() in ("так", "т"):
+                    print(f"Видалено уроків: {catalog.delete_lessons([lesson.id for lesson in selected])}")
+            else:
                 print("Неправильний формат ID уроку. Спробуйте ще раз.")
-                continue
-            catalog.delete_lesson(lesson_id)
 
         elif choice == '5':
             print("\nОберіть режим фільтрації:")
             print("1. За категорією")
             print("2. За автором")
             print("3. За категорією та автором")
+            print("4. За тривалістю (діапазон), з категорією та автором за бажанням")
+            print("5. Довільний запит (наприклад: category = \"Програмування\" and duration >= 30 order by title)")
+            print("6. Показати план виконання запиту")
+            print("7. Схожі уроки (за ID уроку)")
             filter_choice = input("Введіть номер режиму: ")
             category = None
             author = None
+            min_duration = None
+            max_duration = None
             if filter_choice == '1':
                 category = input("Введіть категорію для фільтрації: ")
             elif filter_choice == '2':
@@ -337,12 +3794,46 @@ def main():
             elif filter_choice == '3':
                 category = input("Введіть категорію для фільтрації: ")
                 author = input("Введіть автора для фільтрації: ")
+            elif filter_choice == '4':
+                try:
+                    min_input = input("Мінімальна тривалість (залиште порожнім, якщо без обмеження): ")
+                    max_input = input("Максимальна тривалість (залиште порожнім, якщо без обмеження): ")
+                    min_duration = int(min_input) if min_input.strip() != "" else None
+                    max_duration = int(max_input) if max_input.strip() != "" else None
+                except ValueError:
+                    print("Тривалість має бути числом.")
+                    continue
+                category = input("Категорія (залиште порожнім для пропуску): ")
+                author = input("Автор (залиште порожнім для пропуску): ")
+            elif filter_choice == '7':
+                try:
+                    similarity.display_similar(input("Введіть ID уроку: ").strip())
+                except ImportError:
+                    print("Для пошуку схожих уроків необхідна бібліотека numpy.")
+                continue
+            elif filter_choice in ('5', '6'):
+                text = input("Введіть запит: ")
+                try:
+                    if filter_choice == '6':
+                        print(catalog.explain(text))
+                        continue
+                    filtered = catalog.query(text)
+                except ValueError as e:
+                    print(f"Помилка у запиті: {e}")
+                    continue
+                if not filtered:
+                    print("За заданими критеріями уроки не знайдені.")
+                for lesson in filtered:
+                    print(lesson)
+                continue
             else:
                 print("Неправильний вибір режиму фільтрації.")
                 continue
 
             filtered = catalog.filter_lessons(category=category if category and category.strip() != "" else None,
-                                              author=author if author and author.strip() != "" else None)
+                                              author=author if author and author.strip() != "" else None,
+                                              min_duration=min_duration,
+                                              max_duration=max_duration)
             if not filtered:
                 print("За заданими критеріями уроки не знайдені.")
             else:
@@ -356,13 +3847,17 @@ def main():
 
         elif choice == '7':
             while True:
+                PROFILER.stop()
                 print("--- Меню плейлистів ---")
                 print("1. Створити новий плейлист")
                 print("2. Переглянути всі плейлисти")
                 print("3. Редагувати плейлист (за ID)")
                 print("4. Видалити плейлист (за ID)")
-                print("5. Повернутись до головного меню")
+                print("5. Знайти плейлисти з уроком (за ID уроку)")
+                print("6. Згенерувати плейлист за бюджетом часу")
+                print("7. Повернутись до головного меню")
                 p_choice = input("Введіть номер дії: ")
+                PROFILER.start(f"playlists-{p_choice}")
 
                 if p_choice == '1':
                     playlist_name = input("Введіть назву нового плейлиста: ")
@@ -381,16 +3876,20 @@ def main():
                         print("Неправильний формат ID плейлиста. Спробуйте ще раз.")
                         continue
                     playlist = playlist_manager.get_playlist_by_id(playlist_id)
-                    if not playlist:
+                    if playlist is None:
                         print("Плейлист не знайдено.")
                     else:
                         while True:
+                            PROFILER.stop()
                             print(f"\n--- Редагування плейлиста: {playlist.name} (ID: {playlist.id}) ---")
                             print("1. Додати урок до плейлиста")
                             print("2. Видалити урок з плейлиста")
                             print("3. Показати плейлист")
-                            print("4. Повернутись до меню плейлистів")
+                            print("4. Перемістити урок на іншу позицію")
+                            print("5. Розкласти на навчальні сесії")
+                            print("6. Повернутись до меню плейлистів")
                             edit_choice = input("Введіть номер дії: ")
+                            PROFILER.start(f"playlist-edit-{edit_choice}")
                             if edit_choice == '1':
                                 catalog.display_lessons()
                                 lesson_id = input("Введіть ID уроку для додавання до плейлиста: ")
@@ -401,9 +3900,15 @@ def main():
                                     continue
                                 index = catalog.find_lesson_index(lesson_id)
                                 if index != -1:
-                                    playlist.add_to_playlist(catalog.lessons[index])
+                                    position_input = input("Позиція у плейлисті (залиште порожнім, щоб додати в кінець): ")
+                                    position = None
+                                    if position_input.strip() != "":
+                                        try:
+                                            position = max(int(position_input) - 1, 0)
+                                        except ValueError:
+                                            position = None
+                                    playlist_manager.add_lesson_to_playlist(playlist, catalog.lessons[index], position)
                                     print("Урок додано до плейлиста.")
-                                    playlist_manager.save_to_file()
                                 else:
                                     print("Неправильний ID уроку.")
                             elif edit_choice == '2':
@@ -417,12 +3922,43 @@ def main():
                                     except ValueError:
                                         print("Неправильний формат ID уроку. Спробуйте ще раз.")
                                         continue
-                                    playlist.remove_from_playlist(lesson_id)
-                                    print("Урок видалено з плейлиста.")
-                                    playlist_manager.save_to_file()
+                                    if playlist_manager.remove_lesson_from_playlist(playlist, lesson_id):
+                                        print("Урок видалено з плейлиста.")
                             elif edit_choice == '3':
                                 playlist.display_playlist()
                             elif edit_choice == '4':
+                                playlist.display_playlist()
+                                try:
+                                    source = int(input("Поточна позиція уроку: ")) - 1
+                                    target = int(input("Нова позиція уроку: ")) - 1
+                                except ValueError:
+                                    print("Позиція має бути числом.")
+                                    continue
+                                if playlist_manager.move_lesson_in_playlist(playlist, source, target):
+                                    print("Урок переміщено.")
+                            elif edit_choice == '5':
+                                try:
+                                    max_minutes = int(input("Максимум хвилин на сесію: "))
+                                except ValueError:
+                                    print("Ліміт має бути числом.")
+                                    continue
+                                if max_minutes <= 0:
+                                    print("Ліміт має бути більшим за нуль.")
+                                    continue
+                                period = "week" if input("Сесії щодня чи щотижня? (д/т): ").strip().lower() in (
+                                    "т", "тиждень", "щотижня") else "day"
+                                keep_order = input("Зберігати порядок уроків? (так/ні): ").strip().lower() not in (
+                                    "ні", "н")
+                                start_input = input("Дата початку РРРР-ММ-ДД (залиште порожнім для сьогодні): ")
+                                start = None
+                                if start_input.strip() != "":
+                                    try:
+                                        start = datetime.date.fromisoformat(start_input.strip())
+                                    except ValueError:
+                                        print("Неправильний формат дати.")
+                                        continue
+                                StudyPlanner(max_minutes, period, keep_order).display_schedule(playlist, start)
+                            elif edit_choice == '6':
                                 break
                             else:
                                 print("Неправильний вибір.")
@@ -438,11 +3974,77 @@ def main():
                     else:
                         print("Плейлист не знайдено.")
                 elif p_choice == '5':
+                    lesson_id = input("Введіть ID уроку: ")
+                    containing = playlist_manager.playlists_containing(lesson_id)
+                    if not containing:
+                        print("Урок не входить до жодного плейлиста.")
+                    else:
+                        for playlist in containing:
+                            print(f"Плейлист: {playlist.name} (ID: {playlist.id})")
+                elif p_choice == '6':
+                    playlist_name = input("Введіть назву нового плейлиста: ")
+                    try:
+                        budget = int(input("Бюджет часу (хв.): "))
+                    except ValueError:
+                        print("Бюджет має бути числом.")
+                        continue
+                    if budget <= 0:
+                        print("Бюджет має бути більшим за нуль.")
+                        continue
+                    category = input("Категорія (залиште порожнім для всіх): ").strip() or None
+                    author = input("Автор (залиште порожнім для всіх): ").strip() or None
+                    limit_input = input("Максимум уроків одного автора (залиште порожнім без обмеження): ")
+                    max_per_author = None
+                    if limit_input.strip() != "":
+                        try:
+                            max_per_author = max(int(limit_input), 1)
+                        except ValueError:
+                            print("Обмеження має бути числом.")
+                            continue
+                    new_playlist = builder.build(playlist_name, budget, category, author, max_per_author)
+                    if not new_playlist.lessons:
+                        print("Жоден урок не вміщається в заданий бюджет.")
+                    else:
+                        playlist_manager.add_playlist(new_playlist)
+                        builder.display_summary(new_playlist, budget)
+                        print("Плейлист створено. Його ID:", new_playlist.id)
+                elif p_choice == '7':
                     break
                 else:
                     print("Неправильний вибір.")
 
         elif choice == '8':
+            print("1. Загальна статистика")
+            print("2. Уроки та хвилини за авторами")
+            print("3. Гістограма тривалості за категоріями")
+            print("4. Процентилі тривалості")
+            print("5. Кеш запитів")
+            print("6. Дублікати уроків")
+            stats_choice = input("Введіть номер звіту: ")
+            PROFILER.start(f"statistics-{stats_choice}")
+            try:
+                if stats_choice == '1':
+                    catalog.display_statistics()
+                elif stats_choice == '2':
+                    analytics.display_by_author()
+                elif stats_choice == '3':
+                    analytics.display_histogram()
+                elif stats_choice == '4':
+                    analytics.display_percentiles()
+                elif stats_choice == '5':
+                    catalog.cache.display()
+                elif stats_choice == '6':
+                    deduplicator.display_report(playlist_manager)
+                    if input("Злити точні дублікати? (так/ні): ").strip().lower() in ("так", "т"):
+                        near = input("Злити також схожі уроки? (так/ні): ").strip().lower() in ("так", "т")
+                        removed, repeats = deduplicator.merge(playlist_manager, near=near)
+                        print(f"Видалено дублікатів: {removed}, прибрано повторів у плейлистах: {repeats}")
+                else:
+                    print("Неправильний вибір звіту.")
+            except ImportError:
+                print("Для аналітики необхідна бібліотека numpy.")
+
+        elif choice == '9':
             print("Вихід з програми.")
             break
 
@@ -451,4 +4053,21 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.metrics:
+        METRICS.enable()
+    if args.profile:
+        PROFILER.enable(args.profile, trace_memory=args.tracemalloc)
+    try:
+        if args.command == "bench":
+            with PROFILER.command(f"bench-{args.name}"):
+                BENCHMARKS[args.name](args.sizes)
+        elif args.command == "dedup":
+            with PROFILER.command("dedup"):
+                deduplicate(args)
+        else:
+            main(args.shards, args.workers, args.codec, args.catalog, args.playlists)
+    finally:
+        PROFILER.stop()
+        if args.metrics:
+            METRICS.export(args.metrics)